@@ -0,0 +1,65 @@
+"""Mede o custo da etapa vetorizada de limpeza (utils.cleaning) por milhão de linhas.
+
+Uso:
+    python -m benchmarks.bench_cleaning [--sizes 100000 1000000] [--dirty 0.05]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.synthetic import registros
+
+from utils.cleaning import clean_table
+from utils.helpers import records_to_arrow
+from utils.schemas import table_natural_keys, table_quality_rules
+
+ENDPOINT = 'EnvioIplan'
+
+
+def dirty_records(size, dirty, seed=0):
+    """Pings sintéticos com uma fração `dirty` de duplicatas, coordenadas e timestamps inválidos."""
+    rnd = random.Random(seed)
+    records = registros(size, seed=seed)
+    for i in rnd.sample(range(size), int(size * dirty)):
+        kind = rnd.randrange(4)
+        if kind == 0:
+            records[i] = dict(records[rnd.randrange(size)])
+        elif kind == 1:
+            records[i]['latitude'], records[i]['longitude'] = 0, 0
+        elif kind == 2:
+            records[i]['datahora'] = '2099-01-01 00:00:00'
+        else:
+            records[i]['latitude'] += 1.5
+    return records
+
+
+def run(sizes, dirty, repeat):
+    print(f'{"linhas":>10} {"tempo (s)":>10} {"s/milhão":>10} {"rejeitadas":>11} {"saltos":>8}')
+    for size in sizes:
+        table = records_to_arrow(dirty_records(size, dirty), ENDPOINT)
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cleaned, report = clean_table(
+                table, table_quality_rules[ENDPOINT], key_fields=table_natural_keys[ENDPOINT],
+                now=datetime.now(timezone.utc), min_timestamp=datetime(2015, 1, 1, tzinfo=timezone.utc),
+                future_tolerance=timedelta(hours=1), max_speed_kmh=120,
+            )
+            best = min(best, time.perf_counter() - started)
+        rejected = report['input_rows'] - report['output_rows']
+        print(f'{size:>10} {best:>10.3f} {best * 1_000_000 / size:>10.3f} {rejected:>11} '
+              f'{report["speed_jumps_flagged"]:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--dirty', type=float, default=0.05, help='Fração de linhas com problemas')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.dirty, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Mede o custo de importação do módulo da função (cold start) contra um orçamento.
+
+Cada medição roda em um interpretador novo, como uma instância fria da Cloud Function.
+Também verifica que módulos caros usados só na extração (ex.: Secret Manager) não são
+importados antes de a execução precisar deles. Deve rodar com as dependências do deploy
+(src/requirements.txt), sem as dos benchmarks: com o pandas instalado, o
+google.cloud.bigquery o importa e a verificação falha.
+
+Uso:
+    python -m benchmarks.bench_cold_start [--repeat 5] [--budget-ms 2500] [--top 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.synthetic import BENCHMARK_ENV, SRC_DIR
+
+# Módulos que não devem ser carregados na importação da função; o pandas não é dependência
+# do deploy, mas é importado pelo google.cloud.bigquery sempre que estiver instalado
+DEFERRED_MODULES = ['google.cloud.secretmanager', 'pyarrow.parquet', 'pandas']
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+'''
+
+
+def _env():
+    return {**os.environ, **BENCHMARK_ENV, 'PYTHONPATH': str(SRC_DIR)}
+
+
+def measure_import():
+    """Tempo de `import main` em um interpretador novo e módulos adiados que foram carregados."""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(deferred=DEFERRED_MODULES)],
+        cwd=SRC_DIR, env=_env(), capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def top_imports(top):
+    """Módulos de topo com maior tempo acumulado de importação (python -X importtime)."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=SRC_DIR, env=_env(), capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Apenas as importações feitas diretamente por `main` e pelos módulos da aplicação
+        if name.startswith('   ') and not name.startswith('     '):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def run(repeat, budget_ms, top):
+    samples = []
+    loaded = set()
+    for _ in range(repeat):
+        result = measure_import()
+        samples.append(result['seconds'] * 1000)
+        loaded.update(result['loaded'])
+
+    median = statistics.median(samples)
+    print(f'import main: mediana {median:.0f} ms, mín {min(samples):.0f} ms, máx {max(samples):.0f} ms '
+          f'({repeat} interpretadores novos), orçamento {budget_ms} ms')
+    print('Maiores importações diretas (ms acumulados):')
+    for cumulative, name in top_imports(top):
+        print(f'  {cumulative:>8.1f}  {name}')
+
+    ok = True
+    if loaded:
+        print(f'FALHA: módulos adiados carregados na importação: {sorted(loaded)}')
+        ok = False
+    if median > budget_ms:
+        print(f'FALHA: importação acima do orçamento ({median:.0f} ms > {budget_ms} ms)')
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=2500)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.repeat, args.budget_ms, args.top) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Compara a conversão tipada para Arrow com o caminho antigo via pd.json_normalize.
+
+Uso:
+    python -m benchmarks.bench_conversion [--sizes 10000 100000 1000000] [--endpoint EnvioIplan]
+"""
+import argparse
+import gc
+import time
+
+from benchmarks.synthetic import GENERATORS
+
+import pandas as pd
+from utils.helpers import json_to_df, records_to_arrow
+
+
+def _best_of(fn, repeat, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(sizes, endpoint, repeat):
+    print(f'{"registros":>10} {"json_normalize (s)":>20} {"arrow (s)":>12} {"speedup":>8} '
+          f'{"pandas MB":>10} {"arrow MB":>10}')
+    for size in sizes:
+        records = GENERATORS[endpoint](size)
+        normalize_s, df = _best_of(json_to_df, repeat, records)
+        arrow_s, table = _best_of(records_to_arrow, repeat, records, endpoint)
+        pandas_mb = df.memory_usage(deep=True).sum() / 2 ** 20
+        arrow_mb = table.nbytes / 2 ** 20
+        print(f'{size:>10} {normalize_s:>20.3f} {arrow_s:>12.3f} {normalize_s / arrow_s:>7.1f}x '
+              f'{pandas_mb:>10.1f} {arrow_mb:>10.1f}')
+        del records, df, table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--endpoint', default='EnvioIplan', choices=sorted(GENERATORS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    pd.set_option('display.width', 120)
+    run(args.sizes, args.endpoint, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
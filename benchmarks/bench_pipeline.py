@@ -0,0 +1,215 @@
+"""Mede o pipeline completo de um endpoint sem rede externa: API da Zirix local e BigQuery em memória.
+
+Para cada endpoint e tamanho de janela, executa main.process_data seguido do commit da
+tabela de controle em um processo novo e reporta a vazão de ponta a ponta, o pico de
+memória (RSS) e o tempo por etapa: fetch (requisição e leitura do corpo), decode (JSON),
+convert (Arrow), clean, load e control. Os tempos por etapa somam o tempo próprio de
+cada thread; com sub-janelas em paralelo, a soma pode passar do tempo total.
+
+Uso:
+    python -m benchmarks.bench_pipeline [--endpoints EnvioIplan] [--windows 5 30 60] \
+        [--latency 0.2] [--job-latency 0.0] [--rate EnvioIplan=10000] [--json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import resource
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from benchmarks.fake_zirix import DEFAULT_RATES, ZirixStandIn
+from benchmarks.synthetic import GENERATORS
+
+STAGES = ['fetch', 'decode', 'convert', 'clean', 'load', 'control']
+LOAD_METHODS = ['ensure_destination_table', 'load_arrow_to_bigquery', 'merge_arrow_to_bigquery',
+                'write_arrow_storage', 'get_table_stats', 'count_records']
+CONTROL_METHODS = ['get_control_rows', 'merge_control_rows']
+
+
+class StageTimer:
+    """Acumula o tempo próprio de cada etapa, por thread; uma etapa aninhada pausa a externa."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _add(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] += seconds
+
+    def enter(self, stage):
+        now = time.perf_counter()
+        stack = self._stack()
+        if stack:
+            self._add(stack[-1][0], now - stack[-1][1])
+        stack.append([stage, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        stack = self._stack()
+        stage, started = stack.pop()
+        self._add(stage, now - started)
+        if stack:
+            stack[-1][1] = now
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            self.enter(stage)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed
+
+    def iterate(self, stage, iterable):
+        """Atribui à etapa o tempo gasto produzindo cada item do iterável."""
+        iterator = iter(iterable)
+        while True:
+            self.enter(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+
+def _instrument(timer, client):
+    """Instrumenta as etapas do pipeline no processo do caso (descartado ao final)."""
+    import api.client
+    import main
+
+    decode_chunks, iter_json_array = api.client.decode_chunks, api.client.iter_json_array
+    patches = [
+        mock.patch.object(api.client.APIClient, '_request', timer.wrap('fetch', api.client.APIClient._request)),
+        mock.patch.object(api.client, 'decode_chunks', lambda chunks, encoding: timer.iterate(
+            'decode', decode_chunks(timer.iterate('fetch', chunks), encoding))),
+        mock.patch.object(api.client, 'iter_json_array', lambda chunks: timer.iterate(
+            'decode', iter_json_array(chunks))),
+        mock.patch.object(main, 'records_to_arrow', timer.wrap('convert', main.records_to_arrow)),
+        mock.patch.object(main, 'clean_table', timer.wrap('clean', main.clean_table)),
+        mock.patch('api.provider.get_secret_key', lambda secret_id: 'benchmark'),
+    ]
+    for stage, methods in (('load', LOAD_METHODS), ('control', CONTROL_METHODS)):
+        for method in methods:
+            patches.append(mock.patch.object(client, method, timer.wrap(stage, getattr(client, method))))
+    stack = contextlib.ExitStack()
+    for patch in patches:
+        stack.enter_context(patch)
+    return stack
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(url, endpoint, window_minutes, job_latency, warmup):
+    """Executa um caso em um processo novo; retorna as métricas do caso."""
+    import main
+    from api.provider import get_provider
+    from api.registry import provider_registry
+    from benchmarks.fake_bigquery import InMemoryGoogleCloudClient
+    from cloud.control import ControlState
+    from config import GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE
+    from utils.windows import format_date
+
+    logging.getLogger().setLevel(logging.WARNING)
+    provider_registry['zirix']['url'] = url
+    baseline_rss = _rss_mb()
+
+    client = InMemoryGoogleCloudClient(job_latency=job_latency)
+    timer = StageTimer()
+    start = (datetime.now(timezone.utc) - timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    end = start + timedelta(minutes=window_minutes)
+    table_name = main.destination_table(endpoint)
+
+    def run_once():
+        client.tables.clear()
+        client.set_control_row('zirix', endpoint, start)
+        control = ControlState(client, GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE,
+                               {endpoint: 'zirix'}).load()
+        status = main.process_data(get_provider('zirix'), client, control, endpoint, main.logger,
+                                   format_date(start), format_date(end))
+        control.commit()
+        return status
+
+    with _instrument(timer, client), contextlib.redirect_stdout(io.StringIO()):
+        if warmup:
+            # Gera e guarda as respostas no servidor e aquece sessões e caches da aplicação
+            run_once()
+            timer.totals.clear()
+        started = time.perf_counter()
+        status = run_once()
+        elapsed = time.perf_counter() - started
+
+    rows = client.get_table_stats(GOOGLE_CLOUD_DATASET, table_name)['table_rows']
+    return {
+        'endpoint': endpoint,
+        'window_minutes': window_minutes,
+        'status': status,
+        'rows_loaded': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else 0.0,
+        'peak_rss_mb': _rss_mb(),
+        'baseline_rss_mb': baseline_rss,
+        'bigquery_jobs': client.jobs,
+        'stages': {stage: timer.totals.get(stage, 0.0) for stage in STAGES},
+    }
+
+
+def run(endpoints, windows, rates, latency, job_latency, warmup, as_json):
+    context = multiprocessing.get_context('spawn')
+    with ZirixStandIn(rates=rates, latency=latency) as server:
+        if not as_json:
+            print(f'{"endpoint":<26} {"janela":>6} {"linhas":>9} {"tempo (s)":>9} {"linhas/s":>10} '
+                  f'{"RSS MB":>7} ' + ' '.join(f'{stage:>7}' for stage in STAGES))
+        for endpoint in endpoints:
+            for window_minutes in windows:
+                # Processo novo por caso, para que o pico de RSS seja o do próprio caso
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_case, server.url, endpoint, window_minutes, job_latency,
+                                         warmup).result()
+                if as_json:
+                    print(json.dumps(result))
+                    continue
+                print(f'{endpoint:<26} {window_minutes:>6} {result["rows_loaded"]:>9} '
+                      f'{result["seconds"]:>9.2f} {result["rows_per_second"]:>10.0f} '
+                      f'{result["peak_rss_mb"]:>7.0f} '
+                      + ' '.join(f'{result["stages"][stage]:>7.2f}' for stage in STAGES))
+
+
+def _rate(value):
+    endpoint, rate = value.split('=', 1)
+    return endpoint, float(rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', nargs='+', default=['EnvioIplan'], choices=sorted(GENERATORS))
+    parser.add_argument('--windows', type=int, nargs='+', default=[5, 30, 60], help='Janelas em minutos')
+    parser.add_argument('--rate', type=_rate, action='append', default=[],
+                        help=f'Registros por minuto de janela (endpoint=taxa); padrão {DEFAULT_RATES}')
+    parser.add_argument('--latency', type=float, default=0.2, help='Latência da API em segundos')
+    parser.add_argument('--job-latency', type=float, default=0.0, help='Latência simulada por job do BigQuery')
+    parser.add_argument('--no-warmup', dest='warmup', action='store_false')
+    parser.add_argument('--json', action='store_true', help='Uma linha JSON por caso')
+    args = parser.parse_args()
+    run(args.endpoints, args.windows, dict(args.rate), args.latency, args.job_latency, args.warmup, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Substituto local da API da Zirix para benchmarks offline.
+
+Serve, em um processo separado, arrays JSON sintéticos (benchmarks.synthetic) no caminho
+de cada endpoint, com volume proporcional à janela pedida e latência configurável até o
+primeiro byte. Os corpos gerados ficam em memória, para que repetições da mesma janela
+meçam apenas a transferência e não a geração.
+
+Uso:
+    with ZirixStandIn(rates={'EnvioIplan': 10000}, latency=0.2) as server:
+        server.url  # http://127.0.0.1:<porta>
+"""
+import json
+import multiprocessing
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.synthetic import FMT, GENERATORS
+
+# Registros por minuto de janela, por endpoint (frota de ~5000 veículos com pings a cada 30 s)
+DEFAULT_RATES = {
+    'EnvioIplan': 10000,
+    'EnvioViagensRetroativas': 100,
+    'EnvioViagensConsolidadas': 300,
+}
+
+# Parâmetros de início e fim da janela aceitos pela API
+WINDOW_PARAMS = [('dataInicial', 'dataFinal'), ('datetime_processamento_inicio', 'datetime_processamento_fim')]
+
+WRITE_CHUNK = 256 * 1024
+
+
+def _window(query):
+    for start_param, end_param in WINDOW_PARAMS:
+        if start_param in query and end_param in query:
+            start = datetime.strptime(query[start_param][0], FMT).replace(tzinfo=timezone.utc)
+            end = datetime.strptime(query[end_param][0], FMT).replace(tzinfo=timezone.utc)
+            return start, end
+    return None, None
+
+
+def _handler(rates, latency, bodies):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            endpoint = url.path.strip('/')
+            start, end = _window(parse_qs(url.query))
+            if endpoint not in GENERATORS or start is None:
+                self.send_error(404)
+                return
+
+            key = (endpoint, start, end)
+            body = bodies.get(key)
+            if body is None:
+                size = int(rates.get(endpoint, 0) * (end - start).total_seconds() / 60)
+                records = GENERATORS[endpoint](size, start=start, seed=int(start.timestamp()))
+                body = bodies[key] = json.dumps(records).encode()
+
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            view = memoryview(body)
+            for offset in range(0, len(body), WRITE_CHUNK):
+                self.wfile.write(view[offset:offset + WRITE_CHUNK])
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _serve(rates, latency, ready):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(rates, latency, {}))
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class ZirixStandIn:
+    """Servidor HTTP local com o formato dos endpoints da Zirix, em um processo próprio."""
+
+    def __init__(self, rates=None, latency=0.0):
+        """Construtor da classe ZirixStandIn
+
+        Args:
+            - rates (dict): Registros por minuto de janela, por endpoint.
+            - latency (float): Segundos de espera antes de cada resposta.
+        """
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.latency = latency
+        self.url = None
+        self._process = None
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        self._process = context.Process(target=_serve, args=(self.rates, self.latency, ready), daemon=True)
+        self._process.start()
+        self.url = f'http://127.0.0.1:{ready.get(timeout=30)}'
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,103 @@
+"""Geração de payloads sintéticos com o formato dos endpoints da Zirix."""
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Os módulos da aplicação são importados a partir de src/, como no deploy
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+# Configuração mínima para importar `config` sem um .env; os caminhos dos endpoints
+# são os próprios nomes, como servidos pelo substituto local da Zirix (fake_zirix)
+BENCHMARK_ENV = {
+    'GOOGLE_CLOUD_PROJECT': 'benchmark',
+    'GOOGLE_CLOUD_DATASET': 'benchmark',
+    'URL': 'http://localhost',
+    'PROVIDER': 'zirix',
+    'ENDPOINT_REGISTROS': 'EnvioIplan',
+    'ENDPOINT_REALOCACAO': 'EnvioViagensRetroativas',
+    'ENDPOINT_VIAGENS_CONSOLIDADAS': 'EnvioViagensConsolidadas',
+}
+for _name, _value in BENCHMARK_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+FMT = '%Y-%m-%d %H:%M:%S'
+LINHAS = [str(100 + i) for i in range(300)]
+
+
+def _ts(base, seconds):
+    return (base + timedelta(seconds=seconds)).strftime(FMT)
+
+
+def registros(n, start=None, seed=0, vehicles=5000):
+    """Pings de GPS (EnvioIplan) distribuídos entre `vehicles` veículos."""
+    rnd = random.Random(seed)
+    start = start or datetime(2024, 5, 1, tzinfo=timezone.utc)
+    # Cada veículo parte de um ponto fixo e se desloca ~50 m a cada ping de 30 s
+    origins = [(-22.9 + rnd.uniform(-0.2, 0.2), -43.2 + rnd.uniform(-0.3, 0.3)) for _ in range(vehicles)]
+    records = []
+    for i in range(n):
+        vehicle = i % vehicles
+        step = i // vehicles
+        offset = step * 30 + rnd.randint(0, 5)
+        records.append({
+            'ordem': f'A{vehicle:05d}',
+            'latitude': origins[vehicle][0] + step * 0.0003,
+            'longitude': origins[vehicle][1] + step * 0.0003,
+            'datahora': _ts(start, offset),
+            'velocidade': rnd.randint(0, 80),
+            'linha': LINHAS[vehicle % len(LINHAS)],
+            'sentido': rnd.choice(['I', 'V']),
+            'datahoraenvio': _ts(start, offset + 2),
+            'datahoraservidor': _ts(start, offset + 3),
+        })
+    return records
+
+
+def realocacao(n, start=None, seed=0):
+    """Realocações de veículos entre serviços (EnvioViagensRetroativas)."""
+    rnd = random.Random(seed)
+    start = start or datetime(2024, 5, 1, tzinfo=timezone.utc)
+    records = []
+    for i in range(n):
+        offset = rnd.randint(0, 3600)
+        records.append({
+            'id_veiculo': f'A{rnd.randint(0, 4999):05d}',
+            'servico': rnd.choice(LINHAS),
+            'datetime_operacao': _ts(start, offset),
+            'datetime_entrada': _ts(start, offset - 600),
+            'datetime_saida': _ts(start, offset + 600),
+            'datetime_processamento': _ts(start, offset + 60),
+        })
+    return records
+
+
+def viagens(n, start=None, seed=0):
+    """Viagens consolidadas (EnvioViagensConsolidadas)."""
+    rnd = random.Random(seed)
+    start = start or datetime(2024, 5, 1, tzinfo=timezone.utc)
+    records = []
+    for i in range(n):
+        offset = rnd.randint(0, 3600)
+        records.append({
+            'id_viagem': f'{seed:04d}{i:010d}',
+            'id_veiculo': f'A{rnd.randint(0, 4999):05d}',
+            'servico': rnd.choice(LINHAS),
+            'sentido': rnd.choice(['I', 'V']),
+            'trajeto': f'T{rnd.randint(0, 999):03d}',
+            'datetime_partida': _ts(start, offset),
+            'datetime_chegada': _ts(start, offset + rnd.randint(1200, 5400)),
+            'distancia_planejada': round(rnd.uniform(5, 40), 3),
+            'datetime_processamento': _ts(start, offset + 6000),
+        })
+    return records
+
+
+GENERATORS = {
+    'EnvioIplan': registros,
+    'EnvioViagensRetroativas': realocacao,
+    'EnvioViagensConsolidadas': viagens,
+}
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Cache em disco das respostas da API, por endpoint e parâmetros.
+
+    Cada resposta é gravada como JSON comprimido. O TTL é definido por endpoint
+    (endpoints sem TTL não são cacheados); a data de modificação do arquivo marca o
+    último acesso, e as entradas menos usadas recentemente são descartadas quando o
+    tamanho total passa de `max_bytes`.
+    """
+
+    def __init__(self, directory, ttls, max_bytes):
+        """Construtor da classe ResponseCache
+
+        Args:
+            - directory (str): Diretório dos arquivos do cache.
+            - ttls (dict): TTL em segundos por endpoint.
+            - max_bytes (int): Tamanho máximo somado dos arquivos do cache.
+        """
+        self.directory = directory
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.reset_stats()
+        os.makedirs(directory, exist_ok=True)
+
+    def enabled_for(self, endpoint):
+        return self.ttls.get(endpoint, 0) > 0
+
+    @staticmethod
+    def key(endpoint, params):
+        """Chave do cache; `params` não deve incluir credenciais."""
+        payload = json.dumps({'endpoint': endpoint, 'params': params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json.gz')
+
+    def get(self, endpoint, params):
+        """Retorna a resposta em cache, ou None se ausente ou expirada."""
+        path = self._path(self.key(endpoint, params))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f'Entrada inválida no cache de respostas ({path}): {e}')
+            self._remove(path)
+            self._count('misses')
+            return None
+
+        if time.time() - entry['created_at'] > self.ttls.get(endpoint, 0):
+            self._remove(path)
+            self._count('expired')
+            return None
+
+        os.utime(path)  # Marca o acesso para a política LRU
+        self._count('hits')
+        return entry['response']
+
+    def put(self, endpoint, params, response):
+        """Grava uma resposta no cache e aplica o limite de tamanho."""
+        path = self._path(self.key(endpoint, params))
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+            json.dump({'created_at': time.time(), 'response': response}, file)
+        os.replace(tmp_path, path)
+        self._count('writes')
+        self._evict()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'writes': 0, 'evictions': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json.gz'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                self._stats['evictions'] += 1
@@ -1,15 +1,67 @@
 import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 import requests
-from requests.exceptions import HTTPError, Timeout, ConnectionError, RequestException
+from requests.adapters import HTTPAdapter
+from requests.exceptions import (
+    HTTPError, Timeout, ConnectionError, ChunkedEncodingError, RequestException
+)
+from utils import metrics
 from utils.errors import ApplicationRequestError
+from utils.json_stream import decode_chunks, iter_json_array, iter_batches
 
 
 logger = logging.getLogger(__name__)
 
+# Status HTTP considerados transitórios; demais erros 4xx não são repetidos
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Sessões compartilhadas por URL base, reaproveitadas entre invocações quentes
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url, pool_size):
+    """Retorna a sessão HTTP com pool de conexões (keep-alive) associada à URL base.
+
+    Args:
+        base_url (str): URL base da API.
+        pool_size (int): Número máximo de conexões mantidas no pool.
+
+    Returns:
+        requests.Session: Sessão reutilizável entre chamadas e invocações.
+    """
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[base_url] = session
+            logger.debug(f'Sessão HTTP criada para {base_url}')
+        return session
+
+
+def _timed_chunks(chunks, received):
+    """Repassa os blocos lidos da conexão, somando em `received` os bytes e o tempo de leitura."""
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        received['seconds'] += time.perf_counter() - started
+        if chunk is None:
+            return
+        received['bytes'] += len(chunk)
+        yield chunk
+
 
 class APIClient:
 
-    def __init__(self, base_url, api_key, retries, timeout):
+    def __init__(self, base_url, api_key, retries, timeout,
+                 backoff=1.0, backoff_max=60.0, pool_size=10):
         self.base_url = base_url
         self.api_key = api_key
         self.headers = {
@@ -17,58 +69,137 @@ class APIClient:
         }
         self.retries = retries
         self.timeout = timeout
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.session = get_session(base_url, pool_size)
 
-    def get(self, endpoint, params=None):
+    def _backoff_delay(self, attempt):
+        """Backoff exponencial com jitter completo."""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+
+    def _retry_after_delay(self, response):
+        """Interpreta o cabeçalho Retry-After (segundos ou data HTTP), se presente."""
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        return max(0.0, delay)
+
+    def _wait_before_retry(self, attempt, response=None):
+        delay = self._retry_after_delay(response)
+        if delay is None:
+            delay = self._backoff_delay(attempt)
+        elif delay > self.backoff_max:
+            # Repetir antes do prazo pedido pelo servidor não respeitaria o Retry-After
+            raise ApplicationRequestError(
+                f'Interrompendo. Retry-After de {delay:.0f}s excede o limite de {self.backoff_max:.0f}s '
+                f'entre tentativas ao acessar {response.url}'
+            )
+        logger.info(f'Tentando novamente em {delay:.1f}s...')
+        metrics.record('http_request', retries=1)
+        time.sleep(delay)
+
+    def _request(self, endpoint, params=None, stream=False):
         url = f"{self.base_url}/{endpoint}"
-        for i in range(self.retries):
+        for attempt in range(1, self.retries + 1):
+            last_attempt = attempt == self.retries
             try:
-                response = requests.get(url, headers=self.headers, params=params,
-                                        timeout=self.timeout)
+                response = self.session.get(url, headers=self.headers, params=params,
+                                            timeout=self.timeout, stream=stream)
                 response.raise_for_status()
 
                 break
 
             except HTTPError as http_err:
+                response = http_err.response
                 logger.error(f'Erro HTTP - Status {response.status_code}: {response.text}')
-                if i == self.retries - 1:
+                if last_attempt or response.status_code not in RETRYABLE_STATUS:
                     raise ApplicationRequestError(
                         f'Interrompendo. Erro HTTP ao acessar {url}: {http_err}'
                     ) from http_err
-                else:
-                    logger.info('Tentando novamente...')
+                self._wait_before_retry(attempt, response)
 
             except Timeout as timeout_err:
                 logger.error(f'Erro de timeout: {timeout_err}')
-                if i == self.retries - 1:
+                if last_attempt:
                     raise ApplicationRequestError(
                         f'Interrompendo. Timeout ao acessar {url}: {timeout_err}'
                     ) from timeout_err
-                else:
-                    logger.info('Tentando novamente...')
+                self._wait_before_retry(attempt)
 
-            except ConnectionError as conn_err:
+            except (ConnectionError, ChunkedEncodingError) as conn_err:
                 logger.error(f'Erro de Conexão: {conn_err}')
-                if i == self.retries - 1:
+                if last_attempt:
                     raise ApplicationRequestError(
                         f'Interrompendo. Erro de conexão ao acessar {url}: {conn_err}'
                     ) from conn_err
-                else:
-                    logger.info('Tentando novamente...')
+                self._wait_before_retry(attempt)
 
             except RequestException as req_err:
+                # Erros de requisição não transitórios (URL inválida, redirecionamentos etc.)
                 logger.error(f'Erro na requisicao: {req_err}')
-                if i == self.retries - 1:
-                    raise ApplicationRequestError(
-                        f'Interrompendo. Erro na requisição ao acessar {url}: {req_err}'
-                    ) from req_err
-                else:
-                    logger.info('Tentando novamente...')
+                raise ApplicationRequestError(
+                    f'Interrompendo. Erro na requisição ao acessar {url}: {req_err}'
+                ) from req_err
 
             except Exception as exc:
                 logger.error('Um erro inesperado aconteceu.')
-                if i == self.retries - 1:
-                    raise ApplicationRequestError() from exc
-                else:
-                    logger.info('Tentando novamente...')
+                raise ApplicationRequestError() from exc
+
+        return response
+
+    def get(self, endpoint, params=None):
+        with metrics.span('http_request', requests=1):
+            response = self._request(endpoint, params)
+        metrics.record('download', bytes_downloaded=len(response.content))
+        with metrics.span('decode'):
+            return response.json()
+
+    def get_stream(self, endpoint, params=None, batch_size=10000, chunk_size=1024 * 1024):
+        """Requisita um endpoint que retorna um array JSON e o decodifica incrementalmente.
+
+        A requisição (com retentativas) só é feita no primeiro consumo do gerador.
+        Falhas após o início da leitura do corpo não são repetidas, pois lotes
+        anteriores já podem ter sido entregues.
 
-        return response.json()
+        Args:
+            endpoint (str): Endpoint da API.
+            params (dict): Parâmetros da requisição.
+            batch_size (int): Quantidade máxima de registros por lote.
+            chunk_size (int): Tamanho em bytes dos blocos lidos da conexão.
+
+        Yields:
+            list: Lotes de registros do array retornado.
+        """
+        with metrics.span('http_request', requests=1):
+            response = self._request(endpoint, params, stream=True)
+        # Tempo gasto dentro do gerador: leitura da conexão (download) e o restante (decode),
+        # sem contar o processamento de cada lote por quem o consome
+        received = {'bytes': 0, 'seconds': 0.0}
+        busy = 0.0
+        resumed = time.perf_counter()
+        with response:
+            try:
+                chunks = decode_chunks(_timed_chunks(response.iter_content(chunk_size=chunk_size), received),
+                                       encoding=response.encoding or 'utf-8')
+                for batch in iter_batches(iter_json_array(chunks), batch_size):
+                    busy += time.perf_counter() - resumed
+                    yield batch
+                    resumed = time.perf_counter()
+                busy += time.perf_counter() - resumed
+            except (RequestException, ValueError) as err:
+                raise ApplicationRequestError(
+                    f'Interrompendo. Erro na leitura da resposta de {self.base_url}/{endpoint}: {err}'
+                ) from err
+            finally:
+                metrics.record('download', seconds=received['seconds'], bytes_downloaded=received['bytes'])
+                metrics.record('decode', seconds=max(0.0, busy - received['seconds']))
@@ -1,106 +1,114 @@
 import logging
-from enum import Enum
+from functools import lru_cache
+from api.cache import ResponseCache
 from api.client import APIClient
+from api.registry import get_provider_definition
 from config import (
-    URL, API_KEY, ENDPOINT_REGISTROS, ENDPOINT_REALOCACAO, ENDPOINT_VIAGENS_CONSOLIDADAS,
-    TIMEOUT_IN_SECONDS, RETRIES
+    get_secret_key, TIMEOUT_IN_SECONDS, RETRIES, RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX_SECONDS, HTTP_POOL_SIZE,
+    STREAM_BATCH_SIZE, RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_BYTES
 )
+from utils import metrics
+from utils.errors import UnknownParameterError
+from utils.json_stream import iter_batches
 
 logger = logging.getLogger(__name__)
 
 
-class ProviderEnum(Enum):
-    """Classe de enumeração para encapsular parâmetro de provedores de serviço de GPS
-    """
+@lru_cache(maxsize=1)
+def get_response_cache():
+    """Cache de respostas compartilhado entre invocações; None se RESPONSE_CACHE_DIR não estiver definido."""
+    if not RESPONSE_CACHE_DIR:
+        return None
+    return ResponseCache(RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_BYTES)
+
 
-    ZIRIX = "zirix"
+@lru_cache(maxsize=None)
+def get_provider(name):
+    """Provider compartilhado entre invocações; a chave de acesso é lida no primeiro uso."""
+    return Provider(name)
 
 
 class Provider(APIClient):
     """Classe que encapsula os métodos de requisição de dados da API,
-    agnóstico em relação ao provedor.
+    agnóstico em relação ao provedor: endpoints e parâmetros vêm do registro
+    de provedores (api.registry).
     """
 
     def __init__(self, provider):
         """Construtor da classe Provider
 
         Args:
-            - provider (ProviderEnum): Enum do provedor de serviços.
+            - provider (str): Nome do provedor no registro (ex.: 'zirix').
         """
+        definition = get_provider_definition(provider)
         self.provider_name = provider
-        self.url = URL
-        self.api_key = API_KEY
-        self.registros = ENDPOINT_REGISTROS
-        self.realocacao = ENDPOINT_REALOCACAO
-        self.consolidadas = ENDPOINT_VIAGENS_CONSOLIDADAS
+        self.url = definition['url']
+        self.api_key = get_secret_key(definition['secret_id'])
+        self.key_param = definition['key_param']
+        self.endpoints = definition['endpoints']
+        self.cache = get_response_cache()
         super().__init__(base_url=self.url, api_key=self.api_key,
-                         timeout=TIMEOUT_IN_SECONDS, retries=RETRIES)
-
-    def get_registros(self, data_hora_inicio, data_hora_fim):
-        """Método que recupera os registros de GPS.
-
-        Args:
-            data_hora_inicio (str): Timestamp de início da captura dos dados.
-            data_hora_fim (str): Timestamp de fim da captura dos dados.
-
-        Returns:
-            list: Lista dos registros de GPS dos ônibus naquele período especificado
-        """
-
-        params = {
-            "guidIdentificacao": self.api_key,
-            "dataInicial": data_hora_inicio,
-            "dataFinal": data_hora_fim
-        }
-
-        response = self.get(endpoint=self.registros, params=params)
+                         timeout=TIMEOUT_IN_SECONDS, retries=RETRIES,
+                         backoff=RETRY_BACKOFF_SECONDS, backoff_max=RETRY_BACKOFF_MAX_SECONDS,
+                         pool_size=HTTP_POOL_SIZE)
 
-        print(f"Total de registros retornados da API do enpoint REGISTROS: {len(response)}")
-
-        return response
-
-    def get_realocacao(self, data_hora_inicio, data_hora_fim):
-        """Método que recupera as realocações de linhas
+    def fetch(self, endpoint, data_hora_inicio, data_hora_fim, stream=False):
+        """Recupera os registros de um endpoint do provedor em um intervalo.
 
         Args:
+            endpoint (str): Nome do endpoint no registro (ex.: 'EnvioIplan').
             data_hora_inicio (str): Timestamp de início da captura dos dados. (formato YYYY-MM-DD HH:mm:SS)
             data_hora_fim (str): Timestamp de fim da captura dos dados. (formato YYYY-MM-DD HH:mm:SS)
+            stream (bool): Se verdadeiro, decodifica a resposta incrementalmente em lotes.
 
         Returns:
-            list: Lista dos registros de realocações no período especificado
+            list | Iterator[list]: Lista dos registros no período especificado,
+                ou gerador de lotes desses registros quando `stream` é verdadeiro.
         """
+        definition = self.endpoints.get(endpoint)
+        if definition is None:
+            raise UnknownParameterError(f'Endpoint {endpoint} não declarado pelo provedor {self.provider_name}')
 
         params = {
-            "guidIdentificacao": self.api_key,
-            "dataInicial": data_hora_inicio,
-            "dataFinal": data_hora_fim
+            definition['start_param']: data_hora_inicio,
+            definition['end_param']: data_hora_fim
         }
 
-        response = self.get(endpoint=self.realocacao, params=params)
+        return self._fetch(endpoint, definition['path'], params, stream)
 
-        print(f"Total de registros retornados da API do enpoint REALOCACAO: {len(response)}")
+    def _fetch(self, endpoint, path, params, stream):
+        # A chave de acesso fica fora da chave do cache
+        cache = self.cache if self.cache is not None and self.cache.enabled_for(endpoint) else None
+        if cache is not None:
+            cached = cache.get(endpoint, params)
+            if cached is not None:
+                metrics.record('response_cache', hits=1)
+                logger.info(f"Total de registros retornados do cache do endpoint {endpoint}: {len(cached)}")
+                return iter_batches(cached, STREAM_BATCH_SIZE) if stream else cached
 
-        return response
-
-    def get_viagens_consolidadas(self, data_hora_inicio, data_hora_fim):
-        """Método que recupera as viagens consolidadas de um dia
+        request_params = {self.key_param: self.api_key, **params}
+        if stream:
+            return self._fetch_stream(endpoint, path, request_params, cache, params)
 
-        Args:
-            data_hora_início (string): Timestamp de início da captura dos dados. (formato YYYY-MM-DD HH:mm:SS)
-            data_hora_fim (string): Timestamp de fim da captura dos dados. (formato YYYY-MM-DD HH:mm:SS)
+        response = self.get(endpoint=path, params=request_params)
 
-        Returns:
-            list: Lista das viagens consolidadas para o dia selecionado
-        """
+        logger.info(f"Total de registros retornados da API do endpoint {endpoint}: {len(response)}")
 
-        params = {
-            "guidIdentificacao": self.api_key,
-            "datetime_processamento_inicio": data_hora_inicio,
-            "datetime_processamento_fim": data_hora_fim
-        }
+        if cache is not None:
+            cache.put(endpoint, params, response)
+        return response
 
-        response = self.get(endpoint=self.consolidadas, params=params)
+    def _fetch_stream(self, endpoint, path, request_params, cache=None, cache_params=None):
+        total = 0
+        # Só endpoints cacheados (respostas pequenas) acumulam a resposta completa
+        records = [] if cache is not None else None
+        for batch in self.get_stream(endpoint=path, params=request_params, batch_size=STREAM_BATCH_SIZE):
+            total += len(batch)
+            if records is not None:
+                records.extend(batch)
+            yield batch
 
-        print(f"Total de registros retornados da API do enpoint CONSOLIDADAS: {len(response)}")
+        logger.info(f"Total de registros retornados da API do endpoint {endpoint}: {total}")
 
-        return response
+        if cache is not None:
+            cache.put(endpoint, cache_params, records)
@@ -0,0 +1,105 @@
+"""Registro dos provedores de GPS e dos endpoints que cada um expõe.
+
+Cada provedor declara a URL base, o secret da chave de acesso, o parâmetro em que a
+chave é enviada e os seus endpoints. Cada endpoint declara o caminho na API, os nomes
+dos parâmetros de início e fim da janela, a cadência de extração e a tabela de destino.
+Os nomes de endpoint são únicos entre provedores, pois identificam o endpoint na
+tabela de controle, nos schemas (utils.schemas) e nas configurações por endpoint.
+
+Para adicionar um provedor, basta registrá-lo com `register_provider` e declarar os
+schemas dos seus endpoints.
+"""
+from config import (
+    URL, ENDPOINT_REGISTROS, ENDPOINT_REALOCACAO, ENDPOINT_VIAGENS_CONSOLIDADAS, EXTRACTION_INTERVAL_MINUTES
+)
+from utils.errors import ProviderNameError, UnknownParameterError
+
+provider_registry = {}
+# Endpoint -> provedor que o declara
+_endpoint_providers = {}
+
+
+def register_provider(name, definition):
+    """Registra um provedor e seus endpoints.
+
+    Args:
+        name (str): Nome do provedor (coluna `api` da tabela de controle).
+        definition (dict): `url`, `secret_id`, `key_param` e `endpoints`; cada endpoint
+            com `path`, `start_param`, `end_param`, `interval_minutes` e `table`.
+    """
+    duplicated = [
+        endpoint for endpoint in definition['endpoints']
+        if _endpoint_providers.get(endpoint, name) != name
+    ]
+    if duplicated:
+        raise UnknownParameterError(f'Endpoints já registrados por outro provedor: {sorted(duplicated)}')
+    provider_registry[name] = definition
+    for endpoint in definition['endpoints']:
+        _endpoint_providers[endpoint] = name
+
+
+def get_provider_definition(name):
+    definition = provider_registry.get(name)
+    if definition is None:
+        raise ProviderNameError(provider=name)
+    return definition
+
+
+def active_endpoints(providers):
+    """Endpoints dos provedores informados, com o nome do provedor de cada um.
+
+    Returns:
+        dict: Endpoint -> provedor.
+    """
+    return {
+        endpoint: provider
+        for provider in providers
+        for endpoint in get_provider_definition(provider)['endpoints']
+    }
+
+
+def endpoint_definition(endpoint):
+    provider = _endpoint_providers.get(endpoint)
+    if provider is None:
+        raise UnknownParameterError(f'Endpoint desconhecido: {endpoint}')
+    return provider_registry[provider]['endpoints'][endpoint]
+
+
+def destination_table(endpoint):
+    """Tabela de destino do endpoint no BigQuery."""
+    return endpoint_definition(endpoint)['table']
+
+
+def extraction_interval(endpoint):
+    """Cadência do endpoint em minutos; EXTRACTION_INTERVAL_MINUTES sobrepõe a declarada."""
+    return EXTRACTION_INTERVAL_MINUTES.get(endpoint, endpoint_definition(endpoint).get('interval_minutes'))
+
+
+register_provider('zirix', {
+    'url': URL,
+    'secret_id': 'api_key_zirix',
+    'key_param': 'guidIdentificacao',
+    'endpoints': {
+        'EnvioIplan': {
+            'path': ENDPOINT_REGISTROS,
+            'start_param': 'dataInicial',
+            'end_param': 'dataFinal',
+            'interval_minutes': 5,
+            'table': 'sppo_gps_zirix',
+        },
+        'EnvioViagensRetroativas': {
+            'path': ENDPOINT_REALOCACAO,
+            'start_param': 'dataInicial',
+            'end_param': 'dataFinal',
+            'interval_minutes': 60,
+            'table': 'sppo_realocacao_zirix',
+        },
+        'EnvioViagensConsolidadas': {
+            'path': ENDPOINT_VIAGENS_CONSOLIDADAS,
+            'start_param': 'datetime_processamento_inicio',
+            'end_param': 'datetime_processamento_fim',
+            'interval_minutes': 60,
+            'table': 'sppo_viagens_zirix',
+        },
+    },
+})
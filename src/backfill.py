@@ -0,0 +1,155 @@
+"""Reprocessamento histórico retomável, dividido em chunks com checkpoint.
+
+Uso como CLI:
+    python backfill.py --start "2024-05-01 00:00:00" --end "2024-05-08 00:00:00" \
+        [--endpoints EnvioIplan ...] [--chunk-hours 6] [--workers 2]
+
+Uso como função (HTTP): parâmetros `start`, `end`, `endpoints` (separados por vírgula),
+`chunk_hours` e `workers` na query string ou no corpo JSON.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta, timezone
+import functions_framework
+from logger import logger, log_metrics
+from api.provider import get_provider
+from api.registry import active_endpoints
+from cloud.bigquery import GoogleCloudClient
+from config import (
+    PROVIDERS, GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_DATASET, BACKFILL_CHECKPOINT_TABLE, BACKFILL_CHUNK_HOURS,
+    BACKFILL_WORKERS
+)
+from main import extract_and_load
+from utils import metrics
+from utils.errors import UnknownParameterError
+from utils.windows import plan_windows, parse_date, format_date
+
+
+def _utc(value):
+    """Normaliza um datetime para UTC sem fuso, como os demais intervalos da aplicação."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def run_backfill(start, end, endpoints=None, chunk_hours=BACKFILL_CHUNK_HOURS, workers=BACKFILL_WORKERS):
+    """Reprocessa o intervalo [start, end) em chunks, pulando os já concluídos.
+
+    Args:
+        start (str | datetime): Início do intervalo.
+        end (str | datetime): Fim do intervalo.
+        endpoints (list): Endpoints a reprocessar; por padrão, todos os dos provedores ativos.
+        chunk_hours (int): Tamanho de cada chunk em horas.
+        workers (int): Quantidade de chunks processados simultaneamente.
+
+    Returns:
+        dict: Por endpoint, linhas carregadas, chunks concluídos, falhos e linhas por segundo.
+    """
+    run = metrics.start_run('backfill')
+    start, end = _utc(parse_date(start)), _utc(parse_date(end))
+    endpoint_providers = active_endpoints(PROVIDERS)
+    endpoints = endpoints or list(endpoint_providers)
+    unknown = set(endpoints) - set(endpoint_providers)
+    if unknown:
+        raise UnknownParameterError(f'Endpoints desconhecidos: {sorted(unknown)}')
+
+    client = GoogleCloudClient(project_id=GOOGLE_CLOUD_PROJECT)
+    client.create_checkpoint_table_if_not_exists(GOOGLE_CLOUD_DATASET, BACKFILL_CHECKPOINT_TABLE)
+    apis = sorted({endpoint_providers[endpoint] for endpoint in endpoints})
+    completed = {
+        (endpoint, format_date(_utc(chunk_start)), format_date(_utc(chunk_end)))
+        for api in apis
+        for endpoint, chunk_start, chunk_end in client.get_completed_chunks(
+            GOOGLE_CLOUD_DATASET, BACKFILL_CHECKPOINT_TABLE, api, start, end
+        )
+    }
+
+    chunks = [
+        (endpoint, chunk_start, chunk_end)
+        for endpoint in endpoints
+        for chunk_start, chunk_end in plan_windows(start, end, timedelta(hours=chunk_hours))
+        if (endpoint, format_date(chunk_start), format_date(chunk_end)) not in completed
+    ]
+    logger.info(f'Backfill de {format_date(start)} a {format_date(end)}: {len(chunks)} chunks pendentes, '
+                f'{len(completed)} já concluídos')
+
+    summary = {endpoint: {'rows': 0, 'chunks': 0, 'failed': 0} for endpoint in endpoints}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(_process_chunk, endpoint_providers[chunk[0]], client, *chunk): chunk
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            endpoint, chunk_start, chunk_end = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                logger.error(f'Chunk {format_date(chunk_start)} - {format_date(chunk_end)} do endpoint '
+                             f'{endpoint} falhou e será retomado na próxima execução: {e}')
+                summary[endpoint]['failed'] += 1
+                continue
+            summary[endpoint]['rows'] += rows
+            summary[endpoint]['chunks'] += 1
+
+    elapsed = time.perf_counter() - started
+    for endpoint, stats in summary.items():
+        stats['rows_per_second'] = stats['rows'] / elapsed if elapsed else 0.0
+        logger.info(f"Backfill {endpoint}: {stats['rows']} linhas em {stats['chunks']} chunks "
+                    f"({stats['failed']} falhos), {stats['rows_per_second']:.1f} linhas/s")
+    run.finish('partial' if any(stats['failed'] for stats in summary.values()) else 'success')
+    log_metrics('run_summary', **run.summary())
+    return summary
+
+
+def _process_chunk(api, client, endpoint, chunk_start, chunk_end):
+    started = time.perf_counter()
+    gps_provider = get_provider(api)
+    with metrics.endpoint_scope(endpoint), metrics.span('total'):
+        _, loaded = extract_and_load(gps_provider, client, endpoint, format_date(chunk_start),
+                                     format_date(chunk_end))
+    duration = time.perf_counter() - started
+    client.record_checkpoint(GOOGLE_CLOUD_DATASET, BACKFILL_CHECKPOINT_TABLE, api, endpoint,
+                             chunk_start, chunk_end, loaded, duration)
+    logger.info(f'Chunk {format_date(chunk_start)} - {format_date(chunk_end)} do endpoint {endpoint} concluído: '
+                f'{loaded} linhas em {duration:.1f}s ({loaded / duration if duration else 0:.1f} linhas/s)')
+    return loaded
+
+
+@functions_framework.http
+def backfill(request):
+    params = dict(request.args)
+    params.update(request.get_json(silent=True) or {})
+    try:
+        if not params.get('start') or not params.get('end'):
+            raise UnknownParameterError('Os parâmetros "start" e "end" são obrigatórios')
+        endpoints = params.get('endpoints')
+        if isinstance(endpoints, str):
+            endpoints = [endpoint for endpoint in endpoints.split(',') if endpoint]
+        summary = run_backfill(
+            params['start'], params['end'], endpoints=endpoints,
+            chunk_hours=int(params.get('chunk_hours', BACKFILL_CHUNK_HOURS)),
+            workers=int(params.get('workers', BACKFILL_WORKERS)),
+        )
+    except Exception as e:
+        logger.error(f"Erro durante o backfill: {str(e)}")
+        return f"Erro durante o backfill: {str(e)}", 500
+
+    return summary, 200
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Reprocessamento histórico retomável.')
+    parser.add_argument('--start', required=True, help='Início do intervalo (YYYY-MM-DD HH:MM:SS)')
+    parser.add_argument('--end', required=True, help='Fim do intervalo (YYYY-MM-DD HH:MM:SS)')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(active_endpoints(PROVIDERS)))
+    parser.add_argument('--chunk-hours', type=int, default=BACKFILL_CHUNK_HOURS)
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    run_backfill(args.start, args.end, endpoints=args.endpoints, chunk_hours=args.chunk_hours,
+                 workers=args.workers)
@@ -1,24 +1,95 @@
 from google.cloud import bigquery
+import io
 import logging
+import time
+import uuid
+from functools import lru_cache
+import pyarrow as pa
+import pyarrow.compute as pc
 from google.api_core.exceptions import NotFound
-from datetime import datetime
-from utils.table_mapping import table_name_mapping
-from config import BACKOFF_MINUTES
+from datetime import datetime, timedelta, timezone
+from cloud.storage_write import BigQueryArrowWriter, StorageWriteSink
+from config import PARQUET_COMPRESSION
+from utils import metrics
+from utils.errors import GoogleCloudError
+
+# Tabelas cuja existência já foi confirmada, válidas enquanto a instância estiver quente
+_existing_tables = set()
+# Tabelas de destino já validadas -> coluna pela qual estão de fato particionadas (ou None)
+_destination_partitions = {}
+# Tempo de vida das tabelas de staging do MERGE, removidas pelo BigQuery se o processo morrer antes
+STAGING_TABLE_TTL = timedelta(hours=1)
+# Nomes legados (API REST) -> nomes do GoogleSQL, para comparar e converter tipos de coluna
+_STANDARD_TYPES = {'FLOAT': 'FLOAT64', 'INTEGER': 'INT64', 'BOOLEAN': 'BOOL'}
+
+
+def arrow_type_to_bigquery(arrow_type):
+    """Converte um tipo Arrow no tipo de coluna equivalente do BigQuery."""
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'STRING'
+    if pa.types.is_floating(arrow_type):
+        return 'FLOAT'
+    if pa.types.is_integer(arrow_type):
+        return 'INTEGER'
+    if pa.types.is_boolean(arrow_type):
+        return 'BOOLEAN'
+    if pa.types.is_timestamp(arrow_type):
+        return 'TIMESTAMP' if arrow_type.tz is not None else 'DATETIME'
+    if pa.types.is_date(arrow_type):
+        return 'DATE'
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return 'BYTES'
+    raise TypeError(f'Tipo Arrow sem equivalente no BigQuery: {arrow_type}')
+
+
+def standard_type(field_type):
+    """Nome GoogleSQL de um tipo de coluna do BigQuery (ex.: FLOAT -> FLOAT64)."""
+    return _STANDARD_TYPES.get(field_type, field_type)
+
+
+def arrow_schema_to_bigquery(schema):
+    """Converte um schema Arrow declarado em uma lista de SchemaField do BigQuery."""
+    return [
+        bigquery.SchemaField(field.name, arrow_type_to_bigquery(field.type), mode='NULLABLE')
+        for field in schema
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_bigquery_client(project_id):
+    """Cliente do BigQuery compartilhado entre invocações na mesma instância (thread-safe)."""
+    return bigquery.Client(project=project_id)
 
 
 class GoogleCloudClient:
     def __init__(self, project_id):
-        self.client = bigquery.Client(project=project_id)
+        self.client = get_bigquery_client(project_id)
         logging.debug(f"BigQuery client inicializado para o projeto: {project_id}")
 
-    def get_table_name(self, endpoint):
-        return table_name_mapping.get(endpoint, f'table_{endpoint.lower()}')
+    def _table_key(self, dataset_id, table_id):
+        return f'{self.client.project}.{dataset_id}.{table_id}'
+
+    def _track_job(self, kind, job):
+        """Registra um job concluído (id, bytes processados, linhas e duração) nas métricas da invocação."""
+        duration = (job.ended - job.started).total_seconds() if job.started and job.ended else None
+        metrics.record_job(
+            kind, job.job_id,
+            bytes_processed=getattr(job, 'total_bytes_processed', None),
+            bytes_billed=getattr(job, 'total_bytes_billed', None),
+            rows=getattr(job, 'num_dml_affected_rows', None) or getattr(job, 'output_rows', None),
+            duration_seconds=duration,
+        )
 
     def create_control_table_if_not_exists(self, dataset_id, control_table_id):
+        if self._table_key(dataset_id, control_table_id) in _existing_tables:
+            return
         dataset_ref = self.client.dataset(dataset_id)
         table_ref = dataset_ref.table(control_table_id)
         try:
             self.client.get_table(table_ref)
+            _existing_tables.add(self._table_key(dataset_id, control_table_id))
             logging.debug(f"Tabela de controle '{control_table_id}' já existe.")
         except NotFound:
             schema = [
@@ -30,94 +101,522 @@ class GoogleCloudClient:
             table = bigquery.Table(table_ref, schema=schema)
             self.client.create_table(table)
             logging.info(f"Tabela de controle '{control_table_id}' criada com sucesso.")
-            # Inserir um registro inicial para evitar problemas de fluxo
-            query = f"""
-                INSERT INTO `{self.client.project}.{dataset_id}.{control_table_id}` (api, endpoint, last_extraction, status)
-                VALUES 
-                    ('zirix', 'EnvioIplan', '{datetime.utcnow()}', 'success'),
-                    ('zirix', 'EnvioViagensConsolidadas', '{datetime.utcnow()}', 'success'),
-                    ('zirix', 'EnvioViagensRetroativas', '{datetime.utcnow()}', 'success')
-            """
-            self.client.query(query).result()
-            logging.info(f"Registro inicial inserido na tabela de controle '{control_table_id}'.")
-
-    def get_failed_success_endpoints(self, dataset_id, control_table_id, api):
+            # As linhas dos endpoints ativos são incluídas por ControlState.load
+            _existing_tables.add(self._table_key(dataset_id, control_table_id))
+
+    def get_control_rows(self, dataset_id, control_table_id, apis):
+        """Lê, em uma única consulta, o estado de todos os endpoints das APIs na tabela de controle.
+
+        Args:
+            apis (list): Nomes das APIs (provedores).
+
+        Returns:
+            list: Linhas com api, endpoint, last_extraction e status.
+        """
         query = f"""
-            SELECT endpoint, last_extraction, status
-            FROM `{dataset_id}.{control_table_id}`
-            WHERE api = '{api}'
-            AND status IN ('failed', 'success')  -- Considera tanto falhos quanto sucesso
-            AND TIMESTAMP_DIFF(CURRENT_TIMESTAMP(), last_extraction, MINUTE) > {BACKOFF_MINUTES}
+            SELECT api, endpoint, last_extraction, status
+            FROM `{self.client.project}.{dataset_id}.{control_table_id}`
+            WHERE api IN UNNEST(@apis)
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("apis", "STRING", list(apis))]
+        )
+        with metrics.span('bq_control_read'):
+            job = self.client.query(query, job_config=job_config)
+            rows = list(job.result())
+        self._track_job('control_read', job)
+        return rows
+
+    def merge_control_rows(self, dataset_id, control_table_id, rows):
+        """Aplica várias atualizações na tabela de controle com um único MERGE.
+
+        Args:
+            rows (list): Dicionários com api, endpoint, last_extraction e status.
+        """
+        if not rows:
+            return
+        query = f"""
+            MERGE `{self.client.project}.{dataset_id}.{control_table_id}` T
+            USING UNNEST(@rows) S
+            ON T.api = S.api AND T.endpoint = S.endpoint
+            WHEN MATCHED THEN
+            UPDATE SET last_extraction = S.last_extraction, status = S.status
+            WHEN NOT MATCHED THEN
+            INSERT (api, endpoint, last_extraction, status)
+            VALUES(S.api, S.endpoint, S.last_extraction, S.status)
         """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("rows", "STRUCT", [
+                    bigquery.StructQueryParameter(
+                        None,
+                        bigquery.ScalarQueryParameter("api", "STRING", row["api"]),
+                        bigquery.ScalarQueryParameter("endpoint", "STRING", row["endpoint"]),
+                        bigquery.ScalarQueryParameter("last_extraction", "TIMESTAMP", row["last_extraction"]),
+                        bigquery.ScalarQueryParameter("status", "STRING", row["status"]),
+                    )
+                    for row in rows
+                ])
+            ]
+        )
+        try:
+            with metrics.span('bq_control_merge'):
+                job = self.client.query(query, job_config=job_config)
+                job.result()
+            self._track_job('control_merge', job)
+            summary = ', '.join(f"{row['endpoint']}={row['status']}" for row in rows)
+            logging.info(f"Tabela de controle atualizada: {summary}")
+        except Exception as e:
+            logging.error(f"Erro ao atualizar a tabela de controle: {e}")
+            raise
 
-        results = self.client.query(query).result()
-        # Copia os resultados para evitar reiteração
-        results_list = list(results)
+    def ensure_destination_table(self, dataset_id, table_id, schema, partition_field=None,
+                                 clustering_fields=None):
+        """Cria a tabela de destino particionada por dia e clusterizada, ou valida a existente.
 
-        # Log de debug para cada linha
-        for row in results_list:
-            logging.debug(
-                f"Endpoint: {row['endpoint']}, Last Extraction: {row['last_extraction']}, Status: {row['status']}")
+        Uma tabela existente com colunas de tipo diferente do declarado (ex.: `datahora` como
+        STRING em tabelas criadas pelo caminho antigo via pandas) é recusada, pois as cargas
+        falhariam. Uma tabela não particionada por `partition_field` é aceita, mas as cargas
+        seguem sem decorador de partição. Em ambos os casos, a tabela pode ser recriada com
+        `migrate.py`.
 
-        return [row["endpoint"] for row in results_list]
+        Args:
+            dataset_id (str): Dataset de destino.
+            table_id (str): Tabela de destino.
+            schema (pyarrow.Schema): Schema declarado da tabela.
+            partition_field (str): Coluna TIMESTAMP usada no particionamento diário.
+            clustering_fields (list): Colunas de clusterização.
 
-    def get_last_execution(self, dataset_id, control_table_id):
-        query = f"""
-            SELECT last_extraction
-            FROM `{self.client.project}.{dataset_id}.{control_table_id}`
-            WHERE api = 'zirix'
-            AND status IN ('failed', 'success')
+        Returns:
+            str | None: Coluna pela qual a tabela está de fato particionada.
+
+        Raises:
+            GoogleCloudError: Se a tabela existente tiver colunas de tipo diferente do declarado.
         """
-        logging.debug(f"Executando query para obter a última extração: {query}")
-        result = self.client.query(query).result()
-        row = next(result, None)
-        return {'last_extraction': row["last_extraction"]} if row and row["last_extraction"] else None
+        key = self._table_key(dataset_id, table_id)
+        if key in _destination_partitions:
+            return _destination_partitions[key]
+        table_ref = self.client.dataset(dataset_id).table(table_id)
+        try:
+            table = self.client.get_table(table_ref)
+        except NotFound:
+            table = bigquery.Table(table_ref, schema=arrow_schema_to_bigquery(schema))
+            if partition_field:
+                table.time_partitioning = bigquery.TimePartitioning(
+                    type_=bigquery.TimePartitioningType.DAY, field=partition_field
+                )
+            if clustering_fields:
+                table.clustering_fields = clustering_fields
+            self.client.create_table(table)
+            logging.info(f"Tabela '{table_id}' criada com particionamento por '{partition_field}' "
+                         f"e clusterização por {clustering_fields}.")
+            _destination_partitions[key] = partition_field
+            return partition_field
+
+        mismatches = column_type_mismatches(table.schema, schema)
+        if mismatches:
+            details = ', '.join(f'{name}: {current} (declarado {declared})'
+                                for name, (current, declared) in mismatches.items())
+            raise GoogleCloudError(f"Tabela '{table_id}' tem colunas com tipo diferente do declarado ({details}); "
+                                   f"migre-a com migrate.py antes de retomar as cargas.")
+        current_field = table.time_partitioning.field if table.time_partitioning else None
+        if partition_field and current_field != partition_field:
+            # O particionamento não pode ser alterado em uma tabela existente
+            logging.warning(f"Tabela '{table_id}' não está particionada por '{partition_field}' "
+                            f"(atual: {current_field}); as cargas seguem sem decorador de partição. "
+                            f"Migre-a com migrate.py para limitar as varreduras.")
+        if clustering_fields and list(table.clustering_fields or []) != list(clustering_fields):
+            table.clustering_fields = clustering_fields
+            self.client.update_table(table, ["clustering_fields"])
+            logging.info(f"Clusterização da tabela '{table_id}' atualizada para {clustering_fields}.")
+        _destination_partitions[key] = current_field
+        return current_field
+
+    def migrate_destination_table(self, dataset_id, table_id, schema, partition_field=None,
+                                  clustering_fields=None, source_timezone='UTC'):
+        """Recria uma tabela de destino legada com os tipos, o particionamento e a clusterização declarados.
+
+        Os dados são copiados para uma nova tabela, convertendo as colunas de tipo divergente
+        (textos de data/hora são lidos em `source_timezone`; valores inválidos viram NULL), e
+        as tabelas são trocadas por renomeação. A original é mantida como `{table_id}__legacy_<data>`.
+        Deve ser executada com o agendamento da função pausado, pois cargas feitas durante a
+        cópia ficariam apenas na tabela original.
+
+        Returns:
+            str | None: Nome da tabela original renomeada, ou None se a tabela já estava conforme.
+        """
+        project = self.client.project
+        table = self.client.get_table(self.client.dataset(dataset_id).table(table_id))
+        mismatches = column_type_mismatches(table.schema, schema)
+        current_field = table.time_partitioning.field if table.time_partitioning else None
+        if not mismatches and current_field == partition_field:
+            logging.info(f"Tabela '{table_id}' já está conforme o schema e o particionamento declarados.")
+            return None
+
+        existing = [field.name for field in table.schema]
+        if partition_field and partition_field not in existing:
+            raise GoogleCloudError(f"Tabela '{table_id}' não tem a coluna de particionamento '{partition_field}'.")
+        columns = []
+        for field in table.schema:
+            name = field.name
+            if name not in mismatches:
+                columns.append(f'`{name}`')
+            elif mismatches[name] == ('STRING', 'TIMESTAMP'):
+                columns.append(f"SAFE.TIMESTAMP(`{name}`, '{source_timezone}') AS `{name}`")
+            else:
+                columns.append(f'SAFE_CAST(`{name}` AS {mismatches[name][1]}) AS `{name}`')
+        partition_clause = f'PARTITION BY TIMESTAMP_TRUNC(`{partition_field}`, DAY)' if partition_field else ''
+        clustering = [name for name in clustering_fields or [] if name in existing]
+        cluster_clause = f"CLUSTER BY {', '.join(f'`{name}`' for name in clustering)}" if clustering else ''
+
+        migrated_id = f'{table_id}__migrated'
+        legacy_id = f'{table_id}__legacy_{datetime.utcnow():%Y%m%d%H%M%S}'
+        statements = [
+            f"""
+            CREATE OR REPLACE TABLE `{project}.{dataset_id}.{migrated_id}`
+            {partition_clause}
+            {cluster_clause}
+            AS SELECT {', '.join(columns)}
+            FROM `{project}.{dataset_id}.{table_id}`
+            """,
+            f"ALTER TABLE `{project}.{dataset_id}.{table_id}` RENAME TO `{legacy_id}`",
+            f"ALTER TABLE `{project}.{dataset_id}.{migrated_id}` RENAME TO `{table_id}`",
+        ]
+        for statement in statements:
+            job = self.client.query(statement)
+            job.result()
+            self._track_job('migration', job)
+        _destination_partitions.pop(self._table_key(dataset_id, table_id), None)
+        logging.info(f"Tabela '{table_id}' migrada (colunas convertidas: {sorted(mismatches)}, particionamento: "
+                     f"'{partition_field}'); original mantida como '{legacy_id}'.")
+        return legacy_id
+
+    def load_arrow_to_bigquery(self, data, dataset_id, table_id, schema=None, partition_field=None,
+                               allow_field_addition=True):
+        """Carrega dados Arrow no BigQuery como Parquet comprimido, sem passar pelo pandas.
+
+        Args:
+            data (pyarrow.Table | Iterable[pyarrow.RecordBatch]): Dados a carregar.
+            dataset_id (str): Dataset de destino.
+            table_id (str): Tabela de destino.
+            schema (pyarrow.Schema): Schema declarado; por padrão, o schema dos próprios dados.
+            partition_field (str): Coluna de particionamento; se todos os dados caírem em uma
+                única partição e a tabela validada por `ensure_destination_table` estiver de
+                fato particionada por ela, a carga é direcionada à partição ($YYYYMMDD).
+            allow_field_addition (bool): Permite que campos novos estendam a tabela existente.
+
+        Returns:
+            google.cloud.bigquery.LoadJob: Job de carga concluído.
+        """
+        if isinstance(data, pa.Table):
+            schema = schema or data.schema
+            batches = data.to_batches()
+        else:
+            batches = iter(data)
+            if schema is None:
+                first = next(batches, None)
+                if first is None:
+                    return None
+                schema = first.schema
+                batches = _chain_first(first, batches)
+
+        actual_field = _destination_partitions.get(self._table_key(dataset_id, table_id))
+        if partition_field and partition_field == actual_field and isinstance(data, pa.Table):
+            partition = _single_partition(data, partition_field)
+            if partition:
+                table_id = f'{table_id}${partition}'
+
+        import pyarrow.parquet as pq  # Só o caminho de carga precisa do escritor Parquet
+
+        buffer = io.BytesIO()
+        with metrics.span('parquet_encode'):
+            with pq.ParquetWriter(buffer, schema, compression=PARQUET_COMPRESSION) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+        buffer.seek(0)
 
-    def load_df_to_bigquery(self, dataframe, dataset_id, table_id):
         table_ref = self.client.dataset(dataset_id).table(table_id)
         job_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_APPEND"  # Ajuste conforme necessário: "WRITE_TRUNCATE" ou "WRITE_APPEND"
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition="WRITE_APPEND",
+            schema=arrow_schema_to_bigquery(schema),
         )
+        if allow_field_addition:
+            # Campos novos enviados pela API são adicionados à tabela em vez de falhar a carga
+            job_config.schema_update_options = [bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION]
         try:
-            job = self.client.load_table_from_dataframe(dataframe, table_ref, job_config=job_config)
-            job.result()  # Aguarda até que o job seja concluído
+            with metrics.span('bq_load', upload_bytes=buffer.getbuffer().nbytes):
+                job = self.client.load_table_from_file(buffer, table_ref, job_config=job_config)
+                job.result()  # Aguarda até que o job seja concluído
+            self._track_job('load', job)
             logging.info(f"Carregamento para BigQuery concluído: {table_id}")
+            return job
         except Exception as e:
             logging.error(f"Erro ao carregar dados para a tabela {table_id}: {e}")
-            raise  # Relevante para propagar o erro, caso precise de tratamento adicional em outro lugar
+            raise
+
+    def merge_arrow_to_bigquery(self, table, dataset_id, table_id, key_fields, partition_field=None):
+        """Carga idempotente: grava o lote em uma tabela de staging e o mescla no destino pela chave natural.
+
+        Linhas cuja chave já existe no destino são ignoradas, de modo que repetir a
+        carga de uma janela não gera duplicatas. O MERGE é restrito às partições
+        cobertas pelo lote. A tabela de staging é removida ao final e, se o processo for
+        interrompido antes disso, expira após STAGING_TABLE_TTL.
+
+        Args:
+            table (pyarrow.Table): Lote a carregar.
+            dataset_id (str): Dataset de destino.
+            table_id (str): Tabela de destino.
+            key_fields (list): Colunas da chave natural.
+            partition_field (str): Coluna de particionamento do destino.
 
-    def update_control_table(self, dataset_id, control_table_id, api, endpoint, status, last_extraction=None):
-        # Define o valor padrão para last_extraction se não for fornecido
-        last_extraction_value = last_extraction if last_extraction is not None else datetime.utcnow()
+        Returns:
+            google.cloud.bigquery.QueryJob: Job do MERGE concluído.
+        """
+        staging_id = f'{table_id}__staging_{uuid.uuid4().hex[:12]}'
+        project = self.client.project
+        columns = ', '.join(f'`{name}`' for name in table.column_names)
+        keys = ', '.join(f'`{name}`' for name in key_fields)
+        condition = ' AND '.join(f'T.`{name}` IS NOT DISTINCT FROM S.`{name}`' for name in key_fields)
+        order = 'ORDER BY ro_extraction_ts DESC' if 'ro_extraction_ts' in table.column_names else ''
+        query_parameters = []
+        if partition_field and partition_field in table.column_names and table[partition_field].null_count == 0:
+            bounds = pc.min_max(table[partition_field])
+            condition += (f' AND T.`{partition_field}` BETWEEN TIMESTAMP_TRUNC(@partition_min, DAY)'
+                          f' AND @partition_max')
+            query_parameters = [
+                bigquery.ScalarQueryParameter("partition_min", "TIMESTAMP", bounds['min'].as_py()),
+                bigquery.ScalarQueryParameter("partition_max", "TIMESTAMP", bounds['max'].as_py()),
+            ]
         query = f"""
-            MERGE `{self.client.project}.{dataset_id}.{control_table_id}` T
-            USING (SELECT @api AS api, @endpoint AS endpoint, @last_extraction AS last_extraction, @status AS status) S
-            ON T.api = S.api AND T.endpoint = S.endpoint
-            WHEN MATCHED THEN
-            UPDATE SET last_extraction = S.last_extraction, status = S.status
+            MERGE `{project}.{dataset_id}.{table_id}` T
+            USING (
+                SELECT * FROM `{project}.{dataset_id}.{staging_id}`
+                WHERE TRUE
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY {keys} {order}) = 1
+            ) S
+            ON {condition}
             WHEN NOT MATCHED THEN
-            INSERT (api, endpoint, last_extraction, status)
-            VALUES(S.api, S.endpoint, S.last_extraction, S.status)
+            INSERT ({columns})
+            VALUES ({columns})
+        """
+        try:
+            staging = bigquery.Table(self.client.dataset(dataset_id).table(staging_id),
+                                     schema=arrow_schema_to_bigquery(table.schema))
+            staging.expires = datetime.now(timezone.utc) + STAGING_TABLE_TTL
+            self.client.create_table(staging)
+            self.load_arrow_to_bigquery(table, dataset_id, staging_id, allow_field_addition=False)
+            self._add_missing_columns(dataset_id, table_id, table.schema)
+            with metrics.span('bq_merge'):
+                job = self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters))
+                job.result()
+            self._track_job('merge', job)
+            logging.info(f"MERGE para BigQuery concluído: {table_id} ({job.num_dml_affected_rows} linhas novas)")
+            return job
+        except Exception as e:
+            logging.error(f"Erro ao mesclar dados na tabela {table_id}: {e}")
+            raise
+        finally:
+            self.client.delete_table(self.client.dataset(dataset_id).table(staging_id), not_found_ok=True)
+
+    def write_arrow_storage(self, table, dataset_id, table_id, flush_rows=10000, writer_factory=None):
+        """Anexa dados Arrow à tabela pela Storage Write API, sem job de carga.
+
+        O lote é gravado em um stream PENDING confirmado ao final: se qualquer append
+        falhar, nenhuma linha fica visível e o lote pode ser reenviado inteiro.
+
+        Args:
+            table (pyarrow.Table): Dados a anexar.
+            dataset_id (str): Dataset de destino.
+            table_id (str): Tabela de destino.
+            flush_rows (int): Linhas por append.
+            writer_factory (callable): Fábrica do escritor, recebendo (project, dataset, table);
+                por padrão BigQueryArrowWriter. Permite usar um escritor local em testes.
+
+        Returns:
+            dict: Stream, linhas escritas, quantidade de appends e duração.
+        """
+        self._add_missing_columns(dataset_id, table_id, table.schema)
+        writer = (writer_factory or BigQueryArrowWriter)(self.client.project, dataset_id, table_id)
+        started = time.perf_counter()
+        try:
+            with metrics.span('bq_storage_write'), StorageWriteSink(writer, flush_rows=flush_rows) as sink:
+                sink.write(table)
+        except Exception as e:
+            logging.error(f"Erro ao escrever na tabela {table_id} pela Storage Write API: {e}")
+            raise
+        logging.info(f"Escrita pela Storage Write API concluída: {table_id}")
+        return {
+            'stream': writer.stream_name,
+            'rows_written': sink.offset,
+            'appends': sink.appends,
+            'duration_seconds': time.perf_counter() - started,
+        }
+
+    def _add_missing_columns(self, dataset_id, table_id, schema):
+        """Adiciona ao destino as colunas do lote que ainda não existem nele."""
+        target = self.client.get_table(self.client.dataset(dataset_id).table(table_id))
+        existing = {field.name for field in target.schema}
+        missing = [field for field in arrow_schema_to_bigquery(schema) if field.name not in existing]
+        if missing:
+            target.schema = list(target.schema) + missing
+            self.client.update_table(target, ["schema"])
+            logging.info(f"Colunas adicionadas à tabela '{table_id}': {[field.name for field in missing]}")
+
+    def create_checkpoint_table_if_not_exists(self, dataset_id, checkpoint_table_id):
+        """Cria a tabela de checkpoints de reprocessamento, ao lado da tabela de controle."""
+        if self._table_key(dataset_id, checkpoint_table_id) in _existing_tables:
+            return
+        table_ref = self.client.dataset(dataset_id).table(checkpoint_table_id)
+        try:
+            self.client.get_table(table_ref)
+            _existing_tables.add(self._table_key(dataset_id, checkpoint_table_id))
+            logging.debug(f"Tabela de checkpoints '{checkpoint_table_id}' já existe.")
+        except NotFound:
+            schema = [
+                bigquery.SchemaField("api", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("endpoint", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("chunk_start", "TIMESTAMP", mode="REQUIRED"),
+                bigquery.SchemaField("chunk_end", "TIMESTAMP", mode="REQUIRED"),
+                bigquery.SchemaField("rows_loaded", "INTEGER", mode="NULLABLE"),
+                bigquery.SchemaField("duration_seconds", "FLOAT", mode="NULLABLE"),
+                bigquery.SchemaField("completed_at", "TIMESTAMP", mode="REQUIRED"),
+            ]
+            self.client.create_table(bigquery.Table(table_ref, schema=schema))
+            _existing_tables.add(self._table_key(dataset_id, checkpoint_table_id))
+            logging.info(f"Tabela de checkpoints '{checkpoint_table_id}' criada com sucesso.")
+
+    def get_completed_chunks(self, dataset_id, checkpoint_table_id, api, start, end):
+        """Retorna os chunks já concluídos no intervalo, como pares (endpoint, chunk_start, chunk_end)."""
+        query = f"""
+            SELECT DISTINCT endpoint, chunk_start, chunk_end
+            FROM `{self.client.project}.{dataset_id}.{checkpoint_table_id}`
+            WHERE api = @api
+            AND chunk_start >= @start AND chunk_end <= @end
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("api", "STRING", api),
+                bigquery.ScalarQueryParameter("start", "TIMESTAMP", start),
+                bigquery.ScalarQueryParameter("end", "TIMESTAMP", end),
+            ]
+        )
+        rows = self.client.query(query, job_config=job_config).result()
+        return {(row["endpoint"], row["chunk_start"], row["chunk_end"]) for row in rows}
+
+    def record_checkpoint(self, dataset_id, checkpoint_table_id, api, endpoint, chunk_start, chunk_end,
+                          rows_loaded, duration_seconds):
+        """Registra a conclusão de um chunk de reprocessamento."""
+        query = f"""
+            INSERT INTO `{self.client.project}.{dataset_id}.{checkpoint_table_id}`
+                (api, endpoint, chunk_start, chunk_end, rows_loaded, duration_seconds, completed_at)
+            VALUES (@api, @endpoint, @chunk_start, @chunk_end, @rows_loaded, @duration_seconds,
+                    CURRENT_TIMESTAMP())
         """
         job_config = bigquery.QueryJobConfig(
             query_parameters=[
                 bigquery.ScalarQueryParameter("api", "STRING", api),
                 bigquery.ScalarQueryParameter("endpoint", "STRING", endpoint),
-                bigquery.ScalarQueryParameter("last_extraction", "TIMESTAMP", last_extraction_value),
-                bigquery.ScalarQueryParameter("status", "STRING", status),
+                bigquery.ScalarQueryParameter("chunk_start", "TIMESTAMP", chunk_start),
+                bigquery.ScalarQueryParameter("chunk_end", "TIMESTAMP", chunk_end),
+                bigquery.ScalarQueryParameter("rows_loaded", "INT64", rows_loaded),
+                bigquery.ScalarQueryParameter("duration_seconds", "FLOAT64", duration_seconds),
             ]
         )
         try:
             self.client.query(query, job_config=job_config).result()
-            logging.info(f"Status de controle atualizado para '{endpoint}': {status}")
         except Exception as e:
-            logging.error(f"Erro ao atualizar a tabela de controle para o endpoint '{endpoint}': {e}")
+            logging.error(f"Erro ao registrar checkpoint do endpoint '{endpoint}' ({chunk_start} - {chunk_end}): {e}")
             raise
 
-    def count_records(self, dataset_id, table_id):
-        """Conta o número de registros em uma tabela BigQuery."""
+    def count_records(self, dataset_id, table_id, partition_field=None, day=None):
+        """Conta o número de registros em uma tabela BigQuery.
+
+        Com `partition_field` e `day`, conta apenas as linhas da partição diária de `day`,
+        restringindo a consulta a ela em vez de varrer a tabela inteira.
+        """
         query = f"SELECT COUNT(*) as total FROM `{self.client.project}.{dataset_id}.{table_id}`"
-        query_job = self.client.query(query)
-        results = query_job.result()
+        job_config = None
+        if partition_field and day is not None:
+            query += (f" WHERE `{partition_field}` >= TIMESTAMP_TRUNC(@day, DAY)"
+                      f" AND `{partition_field}` < TIMESTAMP_ADD(TIMESTAMP_TRUNC(@day, DAY), INTERVAL 1 DAY)")
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ScalarQueryParameter("day", "TIMESTAMP", day)]
+            )
+        with metrics.span('bq_count'):
+            query_job = self.client.query(query, job_config=job_config)
+            results = query_job.result()
+        self._track_job('count', query_job)
         for row in results:
             return row.total
+
+    def get_load_stats(self, job):
+        """Estatísticas de um job de carga concluído, sem consultar a tabela."""
+        duration = (job.ended - job.started).total_seconds() if job.started and job.ended else None
+        return {
+            'job_id': job.job_id,
+            'rows_written': job.output_rows,
+            'input_bytes': job.input_file_bytes,
+            'output_bytes': job.output_bytes,
+            'duration_seconds': duration,
+        }
+
+    def get_query_stats(self, job):
+        """Estatísticas de um job de consulta DML concluído (ex.: MERGE)."""
+        duration = (job.ended - job.started).total_seconds() if job.started and job.ended else None
+        return {
+            'job_id': job.job_id,
+            'rows_written': job.num_dml_affected_rows,
+            'bytes_processed': job.total_bytes_processed,
+            'duration_seconds': duration,
+        }
+
+    def get_table_stats(self, dataset_id, table_id):
+        """Linhas e bytes da tabela a partir dos metadados (sem custo de consulta)."""
+        with metrics.span('bq_metadata'):
+            table = self.client.get_table(self.client.dataset(dataset_id).table(table_id))
+        return {'table_rows': table.num_rows, 'table_bytes': table.num_bytes}
+
+    def insert_run_history(self, dataset_id, table_id, schema, row):
+        """Grava o resumo de uma invocação na tabela de histórico de execuções.
+
+        Usa inserção por streaming (sem job de carga), criando a tabela particionada por
+        `started_at` na primeira gravação.
+        """
+        self.ensure_destination_table(dataset_id, table_id, schema, partition_field='started_at')
+        errors = self.client.insert_rows_json(self._table_key(dataset_id, table_id), [row])
+        if errors:
+            raise GoogleCloudError(f'Erro ao gravar o histórico de execuções em {table_id}: {errors}')
+
+
+def column_type_mismatches(bigquery_schema, schema):
+    """Colunas declaradas em `schema` (Arrow) que existem na tabela com outro tipo.
+
+    Returns:
+        dict: Coluna -> (tipo atual, tipo declarado), em nomes GoogleSQL.
+    """
+    declared = {field.name: standard_type(arrow_type_to_bigquery(field.type)) for field in schema}
+    mismatches = {}
+    for field in bigquery_schema:
+        current = standard_type(field.field_type)
+        if field.name in declared and current != declared[field.name]:
+            mismatches[field.name] = (current, declared[field.name])
+    return mismatches
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+
+def _single_partition(table, partition_field):
+    """Retorna a partição diária (YYYYMMDD) comum a todas as linhas, ou None."""
+    if partition_field not in table.column_names:
+        return None
+    column = table[partition_field]
+    if column.null_count or not len(column):
+        return None
+    days = pc.min_max(column.cast(pa.timestamp('us', tz='UTC')).cast(pa.date32()))
+    if days['min'] != days['max']:
+        return None
+    return days['min'].as_py().strftime('%Y%m%d')
@@ -0,0 +1,124 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+class ControlState:
+    """Estado da tabela de controle dos provedores ativos durante uma invocação.
+
+    As linhas de todos os provedores são lidas com uma única consulta; mudanças de
+    status e de marca d'água ficam registradas em memória e as pendentes são gravadas
+    com um único MERGE a cada `commit`.
+    """
+
+    def __init__(self, client, dataset_id, control_table_id, endpoints):
+        """Construtor da classe ControlState
+
+        Args:
+            - client (GoogleCloudClient): Cliente do BigQuery.
+            - dataset_id (str): Dataset da tabela de controle.
+            - control_table_id (str): Nome da tabela de controle.
+            - endpoints (dict): Endpoint -> provedor (coluna `api`) dos endpoints ativos.
+        """
+        self.client = client
+        self.dataset_id = dataset_id
+        self.control_table_id = control_table_id
+        self.endpoints = endpoints
+        self.rows = {}
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def load(self, now=None):
+        """Lê o estado atual de todos os endpoints ativos.
+
+        Endpoints ativos sem linha na tabela de controle, ou sem marca d'água (ex.: de um
+        provedor recém-registrado), são gravados com a marca d'água em `now`, de onde a
+        extração começa.
+        """
+        apis = sorted(set(self.endpoints.values()))
+        # Linhas de endpoints que nenhum provedor ativo declara são ignoradas
+        self.rows = {
+            row["endpoint"]: {"last_extraction": row["last_extraction"], "status": row["status"]}
+            for row in self.client.get_control_rows(self.dataset_id, self.control_table_id, apis)
+            if self.endpoints.get(row["endpoint"]) == row["api"]
+        }
+        missing = [
+            endpoint for endpoint in self.endpoints
+            if self.rows.get(endpoint, {}).get("last_extraction") is None
+        ]
+        if missing:
+            now = now or datetime.now(timezone.utc)
+            seeds = {endpoint: {"last_extraction": now, "status": "success"} for endpoint in missing}
+            self.client.merge_control_rows(self.dataset_id, self.control_table_id, [
+                {"api": self.endpoints[endpoint], "endpoint": endpoint, **seed} for endpoint, seed in seeds.items()
+            ])
+            self.rows.update(seeds)
+            logging.info(f"Endpoints adicionados à tabela de controle: {missing}")
+        for endpoint, row in self.rows.items():
+            logging.debug(
+                f"Endpoint: {endpoint}, Last Extraction: {row['last_extraction']}, Status: {row['status']}")
+        return self
+
+    def due_endpoints(self, backoff_minutes, now=None):
+        """Endpoints com status 'failed' ou 'success' cuja última extração passou do backoff."""
+        now = now or datetime.now(timezone.utc)
+        return [
+            endpoint for endpoint, row in self.rows.items()
+            if row["status"] in ("failed", "success")
+            and row["last_extraction"] is not None
+            and now - row["last_extraction"] > timedelta(minutes=backoff_minutes)
+        ]
+
+    def next_due_at(self, backoff_minutes, interval_of):
+        """Primeiro horário em que algum endpoint terá uma janela completa a extrair.
+
+        Considera o backoff da tabela de controle e o intervalo de extração de cada
+        endpoint, dado em minutos por `interval_of(endpoint)`. Retorna None se algum
+        endpoint não tiver marca d'água ou estiver em um status que não é reavaliado
+        por horário.
+        """
+        due = []
+        for endpoint, row in self.rows.items():
+            if row["status"] not in ("failed", "success") or row["last_extraction"] is None:
+                return None
+            wait = max(timedelta(minutes=backoff_minutes), timedelta(minutes=interval_of(endpoint) or 0))
+            due.append(row["last_extraction"] + wait)
+        return min(due, default=None)
+
+    def watermark(self, endpoint):
+        """Fim da última janela extraída pelo endpoint, incluindo mudanças ainda não gravadas,
+        ou None se ele ainda não tiver registro."""
+        with self._lock:
+            row = self._staged.get(endpoint) or self.rows.get(endpoint)
+        return row["last_extraction"] if row else None
+
+    def stage(self, endpoint, status, last_extraction=None):
+        """Registra em memória a mudança de status e de marca d'água de um endpoint.
+
+        Sem `last_extraction`, mantém a marca d'água atual do endpoint (ex.: em falhas,
+        para que a mesma janela seja repetida), ou o horário atual se ele ainda não
+        tiver registro.
+        """
+        if last_extraction is None:
+            last_extraction = self.watermark(endpoint) or datetime.now(timezone.utc)
+        with self._lock:
+            self._staged[endpoint] = {"last_extraction": last_extraction, "status": status}
+
+    def commit(self):
+        """Grava as mudanças registradas desde o último commit com um único MERGE."""
+        with self._lock:
+            staged, self._staged = self._staged, {}
+        if not staged:
+            return
+        rows = [
+            {"api": self.endpoints[endpoint], "endpoint": endpoint, **change}
+            for endpoint, change in staged.items()
+        ]
+        try:
+            self.client.merge_control_rows(self.dataset_id, self.control_table_id, rows)
+        except Exception:
+            with self._lock:
+                # Mantém as mudanças que não foram gravadas para uma nova tentativa
+                self._staged = {**staged, **self._staged}
+            raise
+        self.rows.update(staged)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+import pyarrow as pa
+from google.api_core.exceptions import NotFound
+
+KEY_DATE_FORMAT = '%Y%m%dT%H%M%S'
+
+
+class LocalSpoolBackend:
+    """Armazena os arquivos do spool em um diretório local."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def write(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def read(self, name):
+        with open(self._path(name), 'rb') as file:
+            return file.read()
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def list(self, suffix):
+        names = []
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                if file.endswith(suffix):
+                    names.append(os.path.relpath(os.path.join(directory, file), self.root))
+        return names
+
+
+class GCSSpoolBackend:
+    """Armazena os arquivos do spool em um bucket do Cloud Storage (gs://bucket/prefixo)."""
+
+    def __init__(self, uri):
+        # Dependência carregada apenas quando o spool usa o Cloud Storage
+        from google.cloud import storage
+        bucket, _, prefix = uri[len('gs://'):].partition('/')
+        self.bucket = storage.Client().bucket(bucket)
+        self.prefix = prefix.strip('/')
+
+    def _blob_name(self, name):
+        return f'{self.prefix}/{name}' if self.prefix else name
+
+    def write(self, name, data):
+        self.bucket.blob(self._blob_name(name)).upload_from_string(data)
+
+    def read(self, name):
+        return self.bucket.blob(self._blob_name(name)).download_as_bytes()
+
+    def delete(self, name):
+        blob = self.bucket.blob(self._blob_name(name))
+        if blob.exists():
+            blob.delete()
+
+    def list(self, suffix):
+        start = len(self.prefix) + 1 if self.prefix else 0
+        return [
+            blob.name[start:]
+            for blob in self.bucket.list_blobs(prefix=self.prefix or None)
+            if blob.name.endswith(suffix)
+        ]
+
+
+class Spool:
+    """Spool de lotes extraídos em Arrow IPC, por endpoint e janela, para reprocessar cargas falhas.
+
+    Cada entrada é um arquivo `.arrow` (IPC comprimido) com um `.json` de metadados contendo
+    janela, linhas, tamanho e hash SHA-256, verificado na leitura. Quando o tamanho total
+    passa de `max_bytes`, as entradas mais antigas são descartadas.
+    """
+
+    def __init__(self, uri, max_bytes):
+        """Construtor da classe Spool
+
+        Args:
+            - uri (str): Diretório local ou URI gs://bucket/prefixo.
+            - max_bytes (int): Tamanho máximo somado dos arquivos do spool.
+        """
+        self.backend = GCSSpoolBackend(uri) if uri.startswith('gs://') else LocalSpoolBackend(uri)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(endpoint, start, end):
+        return f'{endpoint}/{start.strftime(KEY_DATE_FORMAT)}__{end.strftime(KEY_DATE_FORMAT)}'
+
+    def put(self, endpoint, start, end, table, extraction_ts):
+        """Grava um lote no spool e retorna seus metadados."""
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        data = sink.getvalue().to_pybytes()
+        key = self._key(endpoint, start, end)
+        entry = {
+            'key': key,
+            'endpoint': endpoint,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'extraction_ts': extraction_ts.isoformat(),
+            'rows': table.num_rows,
+            'size': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self.backend.write(f'{key}.arrow', data)
+            self.backend.write(f'{key}.json', json.dumps(entry).encode())
+            self._evict(keep=key)
+        return entry
+
+    def pending(self, endpoint=None):
+        """Entradas no spool (opcionalmente de um endpoint), da janela mais antiga para a mais recente."""
+        entries = []
+        for name in self.backend.list('.json'):
+            try:
+                entry = json.loads(self.backend.read(name))
+            except (OSError, ValueError) as e:
+                logging.error(f"Metadados inválidos no spool ({name}): {e}")
+                continue
+            if endpoint is None or entry['endpoint'] == endpoint:
+                entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['start'])
+
+    def read(self, entry):
+        """Lê o lote de uma entrada, verificando a integridade; entradas corrompidas ou sem lote são removidas.
+
+        Returns:
+            pyarrow.Table | None: Lote armazenado, ou None se o arquivo estiver corrompido ou ausente.
+        """
+        try:
+            data = self.backend.read(f"{entry['key']}.arrow")
+        except (FileNotFoundError, NotFound):
+            logging.error(f"Lote ausente no spool ({entry['key']}); a janela {entry['start']} - "
+                          f"{entry['end']} do endpoint {entry['endpoint']} precisa ser reprocessada.")
+            self.delete(entry)
+            return None
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            logging.error(f"Lote corrompido no spool ({entry['key']}); a janela {entry['start']} - "
+                          f"{entry['end']} do endpoint {entry['endpoint']} precisa ser reprocessada.")
+            self.delete(entry)
+            return None
+        return pa.ipc.open_file(pa.py_buffer(data)).read_all()
+
+    def delete(self, entry):
+        with self._lock:
+            self.backend.delete(f"{entry['key']}.arrow")
+            self.backend.delete(f"{entry['key']}.json")
+
+    def _evict(self, keep):
+        entries = sorted(self.pending(), key=lambda entry: entry['created_at'])
+        total = sum(entry['size'] for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            logging.warning(f"Spool acima de {self.max_bytes} bytes: descartando {entry['key']}; a janela "
+                            f"{entry['start']} - {entry['end']} do endpoint {entry['endpoint']} "
+                            f"precisa ser reprocessada.")
+            self.backend.delete(f"{entry['key']}.arrow")
+            self.backend.delete(f"{entry['key']}.json")
+            total -= entry['size']
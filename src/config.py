@@ -1,7 +1,20 @@
-from google.cloud import secretmanager
-from decouple import config
+from functools import lru_cache
+from decouple import config, Csv
 
+def parse_mapping(pairs):
+    """Converte uma lista 'chave=valor' (ex.: 'EnvioIplan=15,EnvioViagensRetroativas=60') em dicionário."""
+    return dict(pair.split('=', 1) for pair in pairs if pair)
+
+
+@lru_cache(maxsize=None)
 def get_secret_key(secret_id):
+    """Lê a versão mais recente de um secret; memoizado enquanto a instância estiver quente.
+
+    O cliente do Secret Manager é importado apenas aqui, para que execuções que não
+    chegam a chamar a API não paguem o seu custo de importação.
+    """
+    from google.cloud import secretmanager
+
     client = secretmanager.SecretManagerServiceClient()
     name = f'projects/{GOOGLE_CLOUD_PROJECT}/secrets/{secret_id}/versions/latest'
     response = client.access_secret_version(request={'name': name})
@@ -13,12 +26,69 @@ ENDPOINT_REGISTROS = config('ENDPOINT_REGISTROS', default='')
 ENDPOINT_REALOCACAO = config('ENDPOINT_REALOCACAO', default='')
 ENDPOINT_VIAGENS_CONSOLIDADAS = config('ENDPOINT_VIAGENS_CONSOLIDADAS', default='')
 
-API_KEY = get_secret_key('api_key_zirix')  # Atualizado para usar apenas o secret_id
 GOOGLE_CLOUD_DATASET = config('GOOGLE_CLOUD_DATASET')
 GOOGLE_CLOUD_CONTROL_TABLE = config('GOOGLE_CLOUD_CONTROL_TABLE', default='control_table')
-PROVIDER = config('PROVIDER')
+PROVIDER = config('PROVIDER', default='zirix')
+# Provedores executados em cada invocação (nomes do registro em api.registry)
+PROVIDERS = config('PROVIDERS', default=PROVIDER, cast=Csv())
 START_DATE = config('START_DATE', default='')
 END_DATE = config('END_DATE', default='')
 BACKOFF_MINUTES = config('BACKOFF_MINUTES', default=5, cast=int)
 TIMEOUT_IN_SECONDS = config('TIMEOUT_IN_SECONDS', default=300, cast=int)
 RETRIES = config('RETRIES', default=3, cast=int)
+RETRY_BACKOFF_SECONDS = config('RETRY_BACKOFF_SECONDS', default=1.0, cast=float)
+RETRY_BACKOFF_MAX_SECONDS = config('RETRY_BACKOFF_MAX_SECONDS', default=60.0, cast=float)
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=16, cast=int)
+STREAM_BATCH_SIZE = config('STREAM_BATCH_SIZE', default=50000, cast=int)
+SOURCE_TIMEZONE = config('SOURCE_TIMEZONE', default='UTC')
+PARQUET_COMPRESSION = config('PARQUET_COMPRESSION', default='zstd')
+MAX_WORKERS = config('MAX_WORKERS', default=3, cast=int)
+FETCH_PARALLELISM = config('FETCH_PARALLELISM', default=4, cast=int)
+SUBWINDOW_RETRIES = config('SUBWINDOW_RETRIES', default=2, cast=int)
+SUBWINDOW_MINUTES = {
+    endpoint: int(minutes) for endpoint, minutes in parse_mapping(config(
+        'SUBWINDOW_MINUTES',
+        default='EnvioIplan=30,EnvioViagensRetroativas=60,EnvioViagensConsolidadas=60',
+        cast=Csv()
+    )).items()
+}
+# Sobrepõe, por endpoint, a cadência declarada no registro de provedores (api.registry)
+EXTRACTION_INTERVAL_MINUTES = {
+    endpoint: int(minutes) for endpoint, minutes in parse_mapping(config(
+        'EXTRACTION_INTERVAL_MINUTES',
+        default='',
+        cast=Csv()
+    )).items()
+}
+MAX_CATCHUP_WINDOWS = config('MAX_CATCHUP_WINDOWS', default=12, cast=int)
+LOAD_BATCH_ROWS = config('LOAD_BATCH_ROWS', default=500000, cast=int)
+BACKFILL_CHECKPOINT_TABLE = config('BACKFILL_CHECKPOINT_TABLE', default=f'{GOOGLE_CLOUD_CONTROL_TABLE}_backfill')
+BACKFILL_CHUNK_HOURS = config('BACKFILL_CHUNK_HOURS', default=6, cast=int)
+BACKFILL_WORKERS = config('BACKFILL_WORKERS', default=2, cast=int)
+PARTITION_COUNT_RATE = config('PARTITION_COUNT_RATE', default=0.0, cast=float)
+# Modo de carga por endpoint: 'append' (WRITE_APPEND, padrão) ou 'merge' (staging + MERGE pela
+# chave natural, opt-in: cada carga passa a custar também uma consulta sobre as partições do destino)
+LOAD_MODE = parse_mapping(config('LOAD_MODE', default='', cast=Csv()))
+MIN_VALID_TIMESTAMP = config('MIN_VALID_TIMESTAMP', default='2015-01-01 00:00:00')
+FUTURE_TOLERANCE_MINUTES = config('FUTURE_TOLERANCE_MINUTES', default=60, cast=int)
+MAX_SPEED_KMH = config('MAX_SPEED_KMH', default=120.0, cast=float)
+# Limites aceitos para as coordenadas: lat_min,lon_min,lat_max,lon_max (vazio = limites globais)
+GPS_BOUNDING_BOX = tuple(config('GPS_BOUNDING_BOX', default='', cast=Csv(float))) or None
+# Destino por endpoint: 'load' (job de carga/MERGE) ou 'storage_write' (Storage Write API)
+ENDPOINT_SINK = parse_mapping(config('ENDPOINT_SINK', default='', cast=Csv()))
+STORAGE_WRITE_FLUSH_ROWS = config('STORAGE_WRITE_FLUSH_ROWS', default=10000, cast=int)
+# Spool de lotes extraídos para recarga sem nova extração: diretório local ou gs://bucket/prefixo
+SPOOL_URI = config('SPOOL_URI', default='')
+SPOOL_MAX_BYTES = config('SPOOL_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+# Cache em disco das respostas da API (vazio = desativado), com TTL por endpoint
+RESPONSE_CACHE_DIR = config('RESPONSE_CACHE_DIR', default='')
+RESPONSE_CACHE_TTL_SECONDS = {
+    endpoint: int(seconds) for endpoint, seconds in parse_mapping(config(
+        'RESPONSE_CACHE_TTL_SECONDS',
+        default='EnvioViagensRetroativas=3600,EnvioViagensConsolidadas=3600',
+        cast=Csv()
+    )).items()
+}
+RESPONSE_CACHE_MAX_BYTES = config('RESPONSE_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+# Tabela do histórico de execuções (uma linha de métricas por invocação); vazio = desativado
+RUN_HISTORY_TABLE = config('RUN_HISTORY_TABLE', default='')
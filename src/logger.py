@@ -1,4 +1,20 @@
+import json
 import logging
 
 logging.basicConfig(format='%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s', level='INFO')
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+# Métricas saem sozinhas na linha, sem o prefixo do basicConfig, para que o Cloud Logging
+# as grave como jsonPayload
+metrics_logger = logging.getLogger(f'{__name__}.metrics')
+metrics_logger.setLevel(logging.INFO)
+metrics_logger.propagate = False
+if not metrics_logger.handlers:
+    _metrics_handler = logging.StreamHandler()
+    _metrics_handler.setFormatter(logging.Formatter('%(message)s'))
+    metrics_logger.addHandler(_metrics_handler)
+
+
+def log_metrics(event, **fields):
+    """Emite uma métrica como uma linha de log JSON (log estruturado no Cloud Logging)."""
+    metrics_logger.info(json.dumps({'severity': 'INFO', 'event': event, **fields}, default=str, ensure_ascii=False))
@@ -1,59 +1,117 @@
-from logger import logger
+from logger import logger, log_metrics
+import os
+import random
+import time
+from functools import lru_cache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 import functions_framework
-from api.provider import Provider, ProviderEnum
+import pyarrow as pa
+from api.provider import get_provider, get_response_cache
+from api.registry import active_endpoints, destination_table, extraction_interval
 from config import (
     GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE,
-    START_DATE, END_DATE
+    PROVIDERS, START_DATE, END_DATE, MAX_WORKERS, SOURCE_TIMEZONE, FETCH_PARALLELISM, SUBWINDOW_RETRIES,
+    SUBWINDOW_MINUTES, LOAD_BATCH_ROWS, BACKOFF_MINUTES, MAX_CATCHUP_WINDOWS,
+    PARTITION_COUNT_RATE, LOAD_MODE, MIN_VALID_TIMESTAMP, FUTURE_TOLERANCE_MINUTES, MAX_SPEED_KMH,
+    GPS_BOUNDING_BOX, ENDPOINT_SINK, STORAGE_WRITE_FLUSH_ROWS, SPOOL_URI, SPOOL_MAX_BYTES, RUN_HISTORY_TABLE
 )
 from cloud.bigquery import GoogleCloudClient
-from utils.helpers import json_to_df
+from cloud.control import ControlState
+from cloud.spool import Spool
+from utils import metrics
+from utils.cleaning import clean_table
+from utils.errors import ApplicationRequestError, PartialLoadError, SpooledLoadError, UnknownParameterError
+from utils.helpers import records_to_arrow
+from utils.schemas import (
+    EXTRACTION_TS_FIELD, RUN_HISTORY_SCHEMA, destination_schema, table_partitioning, table_natural_keys, table_quality_rules
+)
+from utils.windows import plan_windows, parse_date, format_date
+
+
+# Próximo horário em que algum endpoint terá uma janela a extrair, segundo o estado de
+# controle gravado pela última invocação nesta instância. Enquanto a instância estiver
+# quente, invocações anteriores a ele terminam sem consultar o BigQuery.
+_next_due_at = None
+
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Cliente do BigQuery criado uma vez e reaproveitado nas invocações seguintes da instância."""
+    return GoogleCloudClient(project_id=GOOGLE_CLOUD_PROJECT)
 
 
 @functions_framework.http
 def main(request):
+    run = metrics.start_run('main')
+    response = ("Erro durante a execução", 500)
+    try:
+        response = run_invocation()
+        return response
+    finally:
+        finish_run(run, response)
+
+
+def run_invocation():
+    """Executa os endpoints que estão no prazo e atualiza a tabela de controle.
+
+    Returns:
+        tuple: Mensagem e status HTTP da resposta.
+    """
+    global _next_due_at
     try:
         logger.info('====== INÍCIO ======')
-        client = GoogleCloudClient(project_id=GOOGLE_CLOUD_PROJECT)
+        now = datetime.now(timezone.utc)
+        if _next_due_at is not None and now < _next_due_at and not (START_DATE and END_DATE):
+            logger.info(f"Nenhum endpoint com janela a extrair antes de {format_date(_next_due_at)}.")
+            return "Nenhum endpoint encontrado", 200
 
-        client.create_control_table_if_not_exists(
-            dataset_id=GOOGLE_CLOUD_DATASET,
-            control_table_id=GOOGLE_CLOUD_CONTROL_TABLE
-        )
+        client = get_client()
 
-        endpoints_to_run = client.get_failed_success_endpoints(
-            dataset_id=GOOGLE_CLOUD_DATASET,
-            control_table_id=GOOGLE_CLOUD_CONTROL_TABLE,
-            api=ProviderEnum.ZIRIX.value
-        )
+        # Estado dos endpoints de todos os provedores ativos lido em uma única consulta;
+        # a marca d'água de cada endpoint é gravada assim que ele conclui
+        endpoint_providers = active_endpoints(PROVIDERS)
+        with metrics.span('control_read'):
+            client.create_control_table_if_not_exists(
+                dataset_id=GOOGLE_CLOUD_DATASET,
+                control_table_id=GOOGLE_CLOUD_CONTROL_TABLE
+            )
+            control = ControlState(
+                client, GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE, endpoint_providers
+            ).load(now)
+
+        endpoints_to_run = control.due_endpoints(BACKOFF_MINUTES, now)
 
         if not endpoints_to_run:
+            _next_due_at = control.next_due_at(BACKOFF_MINUTES, extraction_interval)
             logger.info("Nenhum endpoint falho ou sucesso recente encontrado na tabela de controle.")
             return "Nenhum endpoint encontrado", 200
 
         logger.info(f"Endpoints encontrados: {endpoints_to_run}")
 
-        gps_provider = Provider(ProviderEnum.ZIRIX.value)
-
-        now = datetime.now(timezone.utc)
-        last_execution = client.get_last_execution(GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE)
-
-        for endpoint in endpoints_to_run:
-            start_date, end_date = define_dates(endpoint, last_execution, now)
+        # Cada endpoint, de qualquer provedor, roda seu pipeline de forma independente,
+        # para que uma janela lenta (ex.: viagens consolidadas) não atrase a janela de
+        # 5 minutos do GPS. Sessões HTTP e cliente do BigQuery são compartilhados.
+        timings = {}
+        max_workers = max(1, min(MAX_WORKERS, len(endpoints_to_run)))
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(run_endpoint, endpoint_providers[endpoint], client, control, endpoint, now):
+                        endpoint
+                    for endpoint in endpoints_to_run
+                }
+                for future in as_completed(futures):
+                    timings[futures[future]] = future.result()
+                    # Um timeout ou término da instância não perde o progresso dos endpoints já concluídos
+                    commit_control(control)
+        finally:
+            with metrics.span('control_commit'):
+                control.commit()
+            _next_due_at = control.next_due_at(BACKOFF_MINUTES, extraction_interval)
 
-            if start_date is None or end_date is None:
-                logger.info(f"Pulando o processamento do endpoint {endpoint}. Intervalo de tempo ainda não atingido.")
-                continue
-
-            logger.info(f"Processando endpoint: {endpoint}, Start date: {start_date}, End date: {end_date}")
-            try:
-                process_data(gps_provider, client, endpoint, logger, start_date, end_date)
-            except Exception as e:
-                logger.error(f"Erro ao processar endpoint {endpoint}: {str(e)}")
-                client.update_control_table(
-                    GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE,
-                    ProviderEnum.ZIRIX.value, endpoint, "failed"
-                )
+        log_timing_summary(timings)
 
     except Exception as e:
         logger.error(f"Erro durante a execução: {str(e)}")
@@ -63,65 +121,423 @@ def main(request):
     return "Dados processados com sucesso", 200
 
 
-def define_dates(endpoint, last_execution, now):
+def finish_run(run, response):
+    """Emite as métricas da invocação em um único registro JSON e as grava no histórico, se configurado."""
+    statuses = set(run.endpoint_status.values())
+    if response[1] != 200:
+        status = 'failed'
+    elif statuses & {'failed', 'spooled'}:
+        status = 'partial'
+    elif statuses - {'skipped'}:
+        status = 'success'
+    else:
+        status = 'skipped'
+    run.finish(status)
+    summary = run.summary()
+    log_metrics('run_summary', **summary)
+    # Também em invocações que falharam ou deixaram lotes no spool
+    log_cache_stats()
+
+    # Invocações sem nenhuma janela extraída não são gravadas, para não consultar o BigQuery à toa
+    if RUN_HISTORY_TABLE and status != 'skipped':
+        try:
+            get_client().insert_run_history(GOOGLE_CLOUD_DATASET, RUN_HISTORY_TABLE, RUN_HISTORY_SCHEMA,
+                                            metrics.run_history_row(summary, RUN_HISTORY_SCHEMA))
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o histórico de execuções: {str(e)}")
+
+
+def run_endpoint(provider, client, control, endpoint, now):
+    """Executa o pipeline completo de um endpoint, isolando seus erros dos demais.
+
+    Args:
+        provider (str): Nome do provedor do endpoint no registro.
+
+    Returns:
+        tuple: Status final do endpoint e tempo gasto em segundos.
+    """
+    started = time.perf_counter()
+    with metrics.endpoint_scope(endpoint), metrics.span('total'):
+        status = _run_endpoint(provider, client, control, endpoint, now)
+    metrics.set_status(endpoint, status)
+    return status, time.perf_counter() - started
+
+
+def _run_endpoint(provider, client, control, endpoint, now):
+    spool = get_spool()
+    if spool is not None:
+        try:
+            with metrics.span('spool_replay'):
+                replayed = replay_spool(client, spool, endpoint)
+        except Exception as e:
+            logger.error(f"Erro ao recarregar os lotes do spool do endpoint {endpoint}: {str(e)}")
+            control.stage(endpoint, 'failed')
+            return 'failed'
+        # A marca d'água parou no início do lote guardado; avança sobre os lotes recarregados
+        # para não extraí-los de novo. Lotes perdidos (descartados ou corrompidos) são reextraídos.
+        watermark = advance_watermark(control.watermark(endpoint), replayed)
+        if watermark != control.watermark(endpoint):
+            control.stage(endpoint, 'success', last_extraction=watermark)
+
+    start_date, end_date = define_dates(endpoint, control.watermark(endpoint), now)
+
+    if start_date is None or end_date is None:
+        logger.info(f"Pulando o processamento do endpoint {endpoint}. Intervalo de tempo ainda não atingido.")
+        return 'skipped'
+
+    logger.info(f"Processando endpoint: {endpoint}, Start date: {start_date}, End date: {end_date}")
+    try:
+        gps_provider = get_provider(provider)
+        status = process_data(gps_provider, client, control, endpoint, logger, start_date, end_date)
+    except Exception as e:
+        logger.error(f"Erro ao processar endpoint {endpoint}: {str(e)}")
+        status = 'failed'
+        control.stage(endpoint, 'failed')
+
+    return status
+
+
+def commit_control(control):
+    """Grava as mudanças de controle pendentes; em caso de erro, elas ficam para a próxima gravação."""
+    try:
+        with metrics.span('control_commit'):
+            control.commit()
+    except Exception as e:
+        logger.error(f"Erro ao gravar a tabela de controle; nova tentativa ao final da execução: {str(e)}")
+
+
+def log_timing_summary(timings):
+    """Registra o resumo de status e tempo de execução de cada endpoint."""
+    if not timings:
+        return
+    logger.info('Resumo da execução por endpoint:')
+    for endpoint, (status, elapsed) in sorted(timings.items(), key=lambda item: -item[1][1]):
+        logger.info(f'  {endpoint}: {status} em {elapsed:.2f}s')
+
+
+def log_cache_stats():
+    """Registra os acertos e falhas do cache de respostas na execução e zera os contadores."""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    log_metrics('response_cache', **cache.stats())
+    cache.reset_stats()
+
+
+def define_dates(endpoint, last_extraction, now):
+    """Define o intervalo de extração de um endpoint a partir da sua própria marca d'água.
+
+    O intervalo cobre quantas janelas completas do endpoint couberem entre a última
+    extração e `now` (até MAX_CATCHUP_WINDOWS), permitindo recuperar o atraso em uma
+    única execução.
+
+    Args:
+        endpoint (str): Nome do endpoint.
+        last_extraction (datetime): Fim da última janela carregada do endpoint.
+        now (datetime): Horário de referência da execução.
+
+    Returns:
+        tuple: Datas de início e fim formatadas, ou (None, None) se nenhuma janela completa estiver disponível.
+    """
     if START_DATE and END_DATE:
         start_date = START_DATE
         end_date = END_DATE
     else:
         # Determina o start_date com base na última execução, ou usa o horário atual se for a primeira execução
-        start_date_dt = last_execution['last_extraction'] if last_execution else now
+        start_date_dt = last_extraction or now
         end_date_dt = now
 
         # Definindo o intervalo específico para cada endpoint
-        if endpoint in ['EnvioViagensConsolidadas', 'EnvioViagensRetroativas']:
-            # Extrai dados a cada 1 hora
-            if now - start_date_dt >= timedelta(hours=1):
-                end_date_dt = start_date_dt + timedelta(hours=1)
-            else:
-                return None, None  # Ignora se o intervalo de 1 hora ainda não foi atingido
-        elif endpoint == 'EnvioIplan':
-            # Extrai dados a cada 5 minutos
-            if now - start_date_dt >= timedelta(minutes=5):
-                end_date_dt = start_date_dt + timedelta(minutes=5)
-            else:
-                return None, None  # Ignora se o intervalo de 5 minutos ainda não foi atingido
+        interval_minutes = extraction_interval(endpoint)
+        if interval_minutes:
+            interval = timedelta(minutes=interval_minutes)
+            windows = min((now - start_date_dt) // interval, MAX_CATCHUP_WINDOWS)
+            if windows < 1:
+                return None, None  # Ignora se o intervalo do endpoint ainda não foi atingido
+            end_date_dt = start_date_dt + windows * interval
 
         # Formatação das datas em string para o processamento
-        start_date = start_date_dt.strftime('%Y-%m-%d %H:%M:%S')
-        end_date = end_date_dt.strftime('%Y-%m-%d %H:%M:%S')
+        start_date = format_date(start_date_dt)
+        end_date = format_date(end_date_dt)
 
     return start_date, end_date
 
 
-def process_data(gps_provider, client, endpoint, logger, start_date, end_date):
-    """Executa a lógica de processamento para um endpoint específico."""
+def process_data(gps_provider, client, control, endpoint, logger, start_date, end_date):
+    """Executa a lógica de processamento para um endpoint específico.
+
+    Em caso de falha na extração a marca d'água do endpoint é mantida, e a mesma janela é
+    repetida na próxima execução; se uma carga falhar, ela avança até o fim das cargas já
+    concluídas.
+
+    Returns:
+        str: Status registrado no estado de controle, ou 'no_data' se a API não retornou registros.
+    """
     logger.info(f'Start date: {start_date}')
     logger.info(f'End date: {end_date}')
 
-    results = None
-    if endpoint == 'EnvioIplan':
-        results = gps_provider.get_registros(data_hora_inicio=start_date, data_hora_fim=end_date)
-    elif endpoint == 'EnvioViagensRetroativas':
-        results = gps_provider.get_realocacao(data_hora_inicio=start_date, data_hora_fim=end_date)
-    elif endpoint == 'EnvioViagensConsolidadas':
-        results = gps_provider.get_viagens_consolidadas(data_hora_inicio=start_date, data_hora_fim=end_date)
-    else:
-        raise ValueError(f'Endpoint desconhecido: {endpoint}')
-
-    if results:
-        df_results = json_to_df(results)
-        if not df_results.empty:
-            df_results['ro_extraction_ts'] = datetime.now(timezone.utc)
-            table_name = client.get_table_name(endpoint)
-            client.load_df_to_bigquery(df_results, GOOGLE_CLOUD_DATASET, table_name)
-            client.update_control_table(GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE,
-                                        ProviderEnum.ZIRIX.value, endpoint, 'success',
-                                        last_extraction=datetime.now())
-
-            # Contar registros no BigQuery
-            total_records = client.count_records(GOOGLE_CLOUD_DATASET, table_name)
-            logger.info(f'Total de registros após carregamento: {total_records}')
+    table_name = destination_table(endpoint)
+    # A marca d'água avança exatamente até o fim da janela extraída
+    window_end = parse_date(end_date).replace(tzinfo=timezone.utc)
+    try:
+        received, loaded = extract_and_load(gps_provider, client, endpoint, start_date, end_date,
+                                            spool=get_spool())
+    except SpooledLoadError as e:
+        # A marca d'água fica no início do lote guardado: recarregado do spool, ele é pulado na
+        # próxima execução; se o spool o perder, a janela é extraída de novo
+        control.stage(endpoint, 'failed', last_extraction=e.window_start.replace(tzinfo=timezone.utc))
+        return 'spooled'
+    except PartialLoadError as e:
+        # As cargas anteriores à que falhou já estão no destino: a marca d'água avança até
+        # elas, para que a próxima execução não as carregue de novo
+        control.stage(endpoint, 'failed', last_extraction=e.window_start.replace(tzinfo=timezone.utc))
+        return 'failed'
+
+    if not received:
+        # Janela sem registros também foi extraída com sucesso e não precisa ser repetida
+        control.stage(endpoint, 'success', last_extraction=window_end)
+        return 'no_data'
+
+    # Com todos os registros rejeitados pela limpeza, a janela também é considerada concluída
+    control.stage(endpoint, 'success', last_extraction=window_end)
+    if not loaded:
+        logger.info(f'Nenhum registro válido para carregar no endpoint {endpoint}')
+        return 'success'
+
+    # Metadados da tabela em vez de um COUNT(*) sobre todo o histórico
+    log_metrics('table_stats', endpoint=endpoint, table=table_name,
+                **client.get_table_stats(GOOGLE_CLOUD_DATASET, table_name))
+    if random.random() < PARTITION_COUNT_RATE:
+        partition_field = table_partitioning.get(endpoint, {}).get('partition_field')
+        total_records = client.count_records(GOOGLE_CLOUD_DATASET, table_name,
+                                             partition_field=partition_field, day=window_end)
+        log_metrics('partition_count', endpoint=endpoint, table=table_name, partition_field=partition_field,
+                    day=window_end.date(), total_records=total_records)
+    return 'success'
+
+
+def extract_and_load(gps_provider, client, endpoint, start_date, end_date, spool=None):
+    """Extrai um intervalo de um endpoint e carrega os registros no BigQuery.
+
+    O intervalo é dividido em sub-janelas extraídas em paralelo; os resultados são
+    carregados em ordem, agrupados em até LOAD_BATCH_ROWS linhas por carga. Se uma carga
+    falhar, as sub-janelas seguintes não são carregadas. Não altera a tabela de controle.
+
+    Args:
+        spool (Spool): Se informado, cada lote é guardado antes da carga e mantido se ela falhar.
+
+    Returns:
+        tuple: Total de registros recebidos da API e total de linhas carregadas.
+
+    Raises:
+        PartialLoadError: Se uma carga falhou; o intervalo está carregado até o início do lote
+            que falhou (`window_start`), e os seguintes não são carregados.
+        SpooledLoadError: Se, além disso, o lote que falhou ficou no spool.
+    """
+    step = timedelta(minutes=SUBWINDOW_MINUTES.get(endpoint, 60))
+    windows = plan_windows(parse_date(start_date), parse_date(end_date), step)
+    if len(windows) > 1:
+        logger.info(f'Intervalo do endpoint {endpoint} dividido em {len(windows)} sub-janelas')
+
+    table_name = destination_table(endpoint)
+    partitioning = table_partitioning.get(endpoint, {})
+    client.ensure_destination_table(GOOGLE_CLOUD_DATASET, table_name, destination_schema(endpoint), **partitioning)
+    extraction_ts = datetime.now(timezone.utc)
+    received = 0
+    loaded = 0
+    spooled_start = None
+    pending = []
+    group_start = None
+    parallelism = max(1, min(FETCH_PARALLELISM, len(windows)))
+    executor = ThreadPoolExecutor(max_workers=parallelism)
+    # No máximo `parallelism` sub-janelas extraídas e ainda não carregadas ficam em
+    # memória; a próxima só é submetida quando o resultado da mais antiga é consumido
+    to_submit = iter(windows)
+    in_flight = deque()
+
+    def submit_next():
+        window = next(to_submit, None)
+        if window is not None:
+            in_flight.append((window, executor.submit(fetch_window, gps_provider, endpoint, *window)))
+
+    try:
+        for _ in range(parallelism):
+            submit_next()
+        while in_flight:
+            (window_start, window_end), future = in_flight.popleft()
+            window_received, tables = future.result()
+            submit_next()
+            received += window_received
+            group_start = group_start or window_start
+            pending.extend(tables)
+            # Só `pending` referencia as tabelas da sub-janela, liberadas logo após a carga
+            del future, tables
+            if sum(table.num_rows for table in pending) >= LOAD_BATCH_ROWS or window_end == windows[-1][1]:
+                try:
+                    group_loaded = load_group(client, spool, pending, endpoint, table_name,
+                                              group_start, window_end, extraction_ts)
+                except Exception as e:
+                    raise PartialLoadError(
+                        f'Carga do endpoint {endpoint} a partir de {format_date(group_start)} falhou: {e}',
+                        received=received, loaded=loaded, window_start=group_start
+                    ) from e
+                if group_loaded is None:
+                    # Nada após o lote guardado é carregado, para que o intervalo carregado
+                    # termine exatamente no início dele
+                    spooled_start = group_start
+                    break
+                loaded += group_loaded
+                pending = []
+                group_start = None
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if spooled_start is not None:
+        raise SpooledLoadError(f'Carga do endpoint {endpoint} a partir de {format_date(spooled_start)} falhou; '
+                               f'lote mantido no spool', received=received, loaded=loaded,
+                               window_start=spooled_start)
+    return received, loaded
+
 
+@lru_cache(maxsize=1)
+def get_spool():
+    """Spool de lotes extraídos, compartilhado entre invocações; None se SPOOL_URI não estiver definido.
+
+    No Cloud Functions o spool precisa estar no Cloud Storage: o /tmp de uma instância se
+    perde quando ela é reciclada.
+    """
+    if not SPOOL_URI:
+        return None
+    if not SPOOL_URI.startswith('gs://') and (os.environ.get('K_SERVICE') or os.environ.get('FUNCTION_TARGET')):
+        raise UnknownParameterError(f'SPOOL_URI local ({SPOOL_URI}) não é aceito no Cloud Functions; '
+                                    f'use gs://bucket/prefixo')
+    return Spool(SPOOL_URI, SPOOL_MAX_BYTES)
+
+
+def load_group(client, spool, tables, endpoint, table_name, window_start, window_end, extraction_ts):
+    """Carrega um grupo de tabelas, guardando-o antes no spool quando disponível.
+
+    Returns:
+        int | None: Linhas carregadas, ou None se a carga falhou e o lote ficou no spool.
+    """
+    if spool is None or not tables:
+        return load_tables(client, tables, endpoint, table_name, extraction_ts)
+    table = pa.concat_tables(tables, promote_options='default')
+    entry = spool.put(endpoint, window_start, window_end, table, extraction_ts)
+    try:
+        loaded = load_tables(client, [table], endpoint, table_name, extraction_ts)
+    except Exception as e:
+        logger.error(f"Erro na carga do endpoint {endpoint} ({format_date(window_start)} - "
+                     f"{format_date(window_end)}); lote mantido no spool ({entry['key']}): {str(e)}")
+        return None
+    spool.delete(entry)
+    return loaded
+
+
+def replay_spool(client, spool, endpoint):
+    """Recarrega os lotes de cargas que falharam em execuções anteriores, sem nova extração.
+
+    Returns:
+        list: Entradas recarregadas, da janela mais antiga para a mais recente.
+    """
+    replayed = []
+    table_name = destination_table(endpoint)
+    for entry in spool.pending(endpoint):
+        table = spool.read(entry)
+        if table is None:
+            continue
+        logger.info(f"Recarregando do spool o lote {entry['key']} ({entry['rows']} registros)")
+        loaded = load_tables(client, [table], endpoint, table_name,
+                             datetime.fromisoformat(entry['extraction_ts']))
+        spool.delete(entry)
+        log_metrics('spool_replay', endpoint=endpoint, table=table_name, key=entry['key'], rows_loaded=loaded)
+        replayed.append(entry)
+    return replayed
+
+
+def advance_watermark(watermark, entries):
+    """Avança a marca d'água sobre as entradas do spool que começam exatamente nela, em sequência."""
+    for entry in sorted(entries, key=lambda entry: entry['start']):
+        start = datetime.fromisoformat(entry['start']).replace(tzinfo=timezone.utc)
+        if watermark is not None and start == watermark:
+            watermark = datetime.fromisoformat(entry['end']).replace(tzinfo=timezone.utc)
+    return watermark
+
+
+def fetch_batches(gps_provider, endpoint, start_date, end_date):
+    """Retorna o gerador de lotes de registros do endpoint no intervalo informado."""
+    # Os registros chegam em lotes decodificados incrementalmente, e cada lote segue
+    # direto para a conversão, mantendo o pico de memória limitado
+    return gps_provider.fetch(endpoint, data_hora_inicio=start_date, data_hora_fim=end_date, stream=True)
+
+
+def fetch_window(gps_provider, endpoint, window_start, window_end):
+    """Extrai e converte uma sub-janela; em caso de falha, apenas ela é repetida.
+
+    Returns:
+        tuple: Total de registros recebidos e lista de tabelas Arrow convertidas.
+    """
+    start_date, end_date = format_date(window_start), format_date(window_end)
+    # Roda em uma thread do pool de sub-janelas; as medições são atribuídas ao endpoint
+    with metrics.endpoint_scope(endpoint), metrics.span('extract'):
+        for attempt in range(1, SUBWINDOW_RETRIES + 1):
+            try:
+                received = 0
+                tables = []
+                for batch in fetch_batches(gps_provider, endpoint, start_date, end_date):
+                    received += len(batch)
+                    with metrics.span('convert'):
+                        table = records_to_arrow(batch, endpoint, source_timezone=SOURCE_TIMEZONE)
+                    if table.num_rows:
+                        tables.append(table)
+                metrics.record('extract', rows_received=received)
+                return received, tables
+            except ApplicationRequestError as err:
+                if attempt == SUBWINDOW_RETRIES:
+                    raise
+                logger.warning(f'Falha na sub-janela {start_date} - {end_date} do endpoint {endpoint}: {err}. '
+                               f'Repetindo apenas esta sub-janela.')
+
+
+def load_tables(client, tables, endpoint, table_name, extraction_ts):
+    """Une as tabelas Arrow pendentes e as carrega em um único job (ou staging + MERGE).
+
+    Returns:
+        int: Quantidade de linhas carregadas, após a etapa de limpeza.
+    """
+    if not tables:
+        return 0
+    # Lotes diferentes podem trazer campos não declarados distintos
+    table = pa.concat_tables(tables, promote_options='default')
+    key_fields = table_natural_keys.get(endpoint)
+    with metrics.span('clean'):
+        table, report = clean_table(
+            table, table_quality_rules.get(endpoint, {}), key_fields=key_fields,
+            now=datetime.now(timezone.utc),
+            min_timestamp=parse_date(MIN_VALID_TIMESTAMP).replace(tzinfo=timezone.utc),
+            future_tolerance=timedelta(minutes=FUTURE_TOLERANCE_MINUTES),
+            max_speed_kmh=MAX_SPEED_KMH, bounding_box=GPS_BOUNDING_BOX,
+        )
+    log_metrics('cleaning', endpoint=endpoint, table=table_name, **report)
+    if not table.num_rows:
+        return 0
+    table = table.append_column(
+        EXTRACTION_TS_FIELD, pa.repeat(pa.scalar(extraction_ts, EXTRACTION_TS_FIELD.type), table.num_rows)
+    )
+    partition_field = table_partitioning.get(endpoint, {}).get('partition_field')
+    with metrics.span('load', rows_loaded=table.num_rows):
+        if ENDPOINT_SINK.get(endpoint, 'load') == 'storage_write':
+            # Posições chegam à tabela em segundos, sem fila nem cota de jobs de carga
+            stats = client.write_arrow_storage(table, GOOGLE_CLOUD_DATASET, table_name,
+                                               flush_rows=STORAGE_WRITE_FLUSH_ROWS)
+            log_metrics('storage_write', endpoint=endpoint, table=table_name, **stats)
+        elif LOAD_MODE.get(endpoint, 'append') == 'merge' and key_fields:
+            job = client.merge_arrow_to_bigquery(table, GOOGLE_CLOUD_DATASET, table_name, key_fields,
+                                                 partition_field=partition_field)
+            log_metrics('merge', endpoint=endpoint, table=table_name, received_rows=table.num_rows,
+                        **client.get_query_stats(job))
         else:
-            client.update_control_table(GOOGLE_CLOUD_DATASET, GOOGLE_CLOUD_CONTROL_TABLE,
-                                        ProviderEnum.ZIRIX.value, endpoint, 'failed')
+            job = client.load_arrow_to_bigquery(table, GOOGLE_CLOUD_DATASET, table_name,
+                                                partition_field=partition_field)
+            log_metrics('load', endpoint=endpoint, table=table_name, **client.get_load_stats(job))
+    return table.num_rows
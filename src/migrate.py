@@ -0,0 +1,57 @@
+"""Migração das tabelas de destino legadas para os tipos, o particionamento e a clusterização declarados.
+
+Tabelas criadas pelo caminho antigo (pandas) não são particionadas e podem ter colunas
+de data/hora como texto; enquanto não forem migradas, as cargas seguem sem decorador de
+partição ou são recusadas (ver GoogleCloudClient.ensure_destination_table). Pause o
+agendamento da função antes de migrar.
+
+Uso como CLI:
+    python migrate.py [--endpoints EnvioIplan ...] [--dry-run]
+"""
+import argparse
+from logger import logger
+from api.registry import active_endpoints, destination_table
+from cloud.bigquery import GoogleCloudClient, column_type_mismatches
+from config import PROVIDERS, GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_DATASET, SOURCE_TIMEZONE
+from utils.schemas import destination_schema, table_partitioning
+
+
+def migrate_tables(endpoints=None, dry_run=False):
+    """Migra as tabelas de destino dos endpoints que divergem do declarado.
+
+    Args:
+        endpoints (list): Endpoints cujas tabelas serão migradas; por padrão, todos os dos provedores ativos.
+        dry_run (bool): Apenas registra as divergências, sem alterar as tabelas.
+
+    Returns:
+        dict: Por tabela, o nome da tabela original renomeada, ou None se já estava conforme.
+    """
+    client = GoogleCloudClient(project_id=GOOGLE_CLOUD_PROJECT)
+    migrated = {}
+    for endpoint in endpoints or list(active_endpoints(PROVIDERS)):
+        table_name = destination_table(endpoint)
+        schema = destination_schema(endpoint)
+        partitioning = table_partitioning.get(endpoint, {})
+        if dry_run:
+            table = client.client.get_table(client.client.dataset(GOOGLE_CLOUD_DATASET).table(table_name))
+            current_field = table.time_partitioning.field if table.time_partitioning else None
+            logger.info(f"{table_name}: particionada por {current_field} "
+                        f"(declarado {partitioning.get('partition_field')}), colunas divergentes: "
+                        f"{column_type_mismatches(table.schema, schema)}")
+            continue
+        migrated[table_name] = client.migrate_destination_table(
+            GOOGLE_CLOUD_DATASET, table_name, schema, source_timezone=SOURCE_TIMEZONE, **partitioning
+        )
+    return migrated
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Migração das tabelas de destino legadas.')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(active_endpoints(PROVIDERS)))
+    parser.add_argument('--dry-run', action='store_true', help='Apenas lista as divergências')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    migrate_tables(endpoints=args.endpoints, dry_run=args.dry_run)
@@ -0,0 +1,118 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from utils.schemas import JUMP_FLAG_FIELD
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def clean_table(table, rules, key_fields=None, now=None, min_timestamp=None, future_tolerance=None,
+                max_speed_kmh=None, bounding_box=None):
+    """Etapa vetorizada de validação e deduplicação de um lote antes da carga.
+
+    Todas as regras operam sobre colunas Arrow/NumPy inteiras, sem laços por linha.
+
+    Args:
+        table (pyarrow.Table): Lote convertido por `records_to_arrow`.
+        rules (dict): Colunas do endpoint (`timestamp_field`, `latitude_field`,
+            `longitude_field`, `vehicle_field`); regras sem coluna declarada são ignoradas.
+        key_fields (list): Chave natural para remover pings duplicados no lote.
+        now (datetime): Horário de referência para rejeitar timestamps no futuro.
+        min_timestamp (datetime): Timestamps anteriores a este são rejeitados.
+        future_tolerance (timedelta): Tolerância para timestamps à frente de `now`.
+        max_speed_kmh (float): Velocidade implícita acima da qual um salto de GPS é sinalizado.
+        bounding_box (tuple): (lat_min, lon_min, lat_max, lon_max) aceitos; por padrão, limites globais.
+
+    Returns:
+        tuple: Tabela limpa e dicionário com a quantidade de linhas afetadas por regra.
+    """
+    report = {'input_rows': table.num_rows}
+    keep = pa.array(np.ones(table.num_rows, dtype=bool))
+
+    timestamp_field = rules.get('timestamp_field')
+    if timestamp_field in table.column_names:
+        timestamps = table[timestamp_field]
+        valid = pc.is_valid(timestamps)
+        if min_timestamp is not None:
+            valid = pc.and_(valid, pc.greater_equal(timestamps, pa.scalar(min_timestamp, timestamps.type)))
+        if now is not None:
+            limit = now + future_tolerance if future_tolerance is not None else now
+            valid = pc.and_(valid, pc.less_equal(timestamps, pa.scalar(limit, timestamps.type)))
+        valid = pc.fill_null(valid, False)
+        report['invalid_timestamp'] = _count_rejected(keep, valid)
+        keep = pc.and_(keep, valid)
+
+    latitude_field, longitude_field = rules.get('latitude_field'), rules.get('longitude_field')
+    if latitude_field in table.column_names and longitude_field in table.column_names:
+        lat_min, lon_min, lat_max, lon_max = bounding_box or (-90.0, -180.0, 90.0, 180.0)
+        latitude, longitude = table[latitude_field], table[longitude_field]
+        valid = pc.and_(
+            pc.and_(pc.greater_equal(latitude, lat_min), pc.less_equal(latitude, lat_max)),
+            pc.and_(pc.greater_equal(longitude, lon_min), pc.less_equal(longitude, lon_max)),
+        )
+        # (0, 0) é o valor típico de um receptor sem sinal
+        valid = pc.and_(valid, pc.invert(pc.and_(pc.equal(latitude, 0), pc.equal(longitude, 0))))
+        valid = pc.fill_null(valid, False)
+        report['invalid_coordinates'] = _count_rejected(keep, valid)
+        keep = pc.and_(keep, valid)
+
+    table = table.filter(keep)
+
+    key_fields = [name for name in (key_fields or []) if name in table.column_names]
+    if key_fields and table.num_rows:
+        before = table.num_rows
+        table = _drop_duplicates(table, key_fields)
+        report['duplicates'] = before - table.num_rows
+
+    vehicle_field = rules.get('vehicle_field')
+    if max_speed_kmh and all(name in table.column_names
+                             for name in (vehicle_field, timestamp_field, latitude_field, longitude_field)):
+        jumps = _flag_jumps(table, vehicle_field, timestamp_field, latitude_field, longitude_field, max_speed_kmh)
+        table = table.append_column(JUMP_FLAG_FIELD, pa.array(jumps))
+        report['speed_jumps_flagged'] = int(jumps.sum())
+
+    report['output_rows'] = table.num_rows
+    return table, report
+
+
+def _count_rejected(keep, valid):
+    return int(pc.sum(pc.and_(keep, pc.invert(valid))).as_py() or 0)
+
+
+def _drop_duplicates(table, key_fields):
+    """Mantém a primeira ocorrência de cada chave, preservando a ordem original."""
+    indexed = table.unify_dictionaries().append_column('__row', pa.array(np.arange(table.num_rows)))
+    first = indexed.group_by(key_fields, use_threads=False).aggregate([('__row', 'min')])['__row_min']
+    return table.take(np.sort(first.to_numpy()))
+
+
+def _flag_jumps(table, vehicle_field, timestamp_field, latitude_field, longitude_field, max_speed_kmh):
+    """Sinaliza pings cuja velocidade implícita desde o ping anterior do veículo excede o limite."""
+    vehicles = table.unify_dictionaries()[vehicle_field].combine_chunks()
+    if pa.types.is_dictionary(vehicles.type):
+        # Ordena pelos índices do dicionário: só importa agrupar os pings de cada veículo
+        vehicles = vehicles.indices
+    timestamps = table[timestamp_field].combine_chunks().cast(pa.int64())
+    order = pc.sort_indices(pa.table({'vehicle': vehicles, 'ts': timestamps}),
+                            sort_keys=[('vehicle', 'ascending'), ('ts', 'ascending')])
+    vehicles = pc.take(vehicles, order)
+    vehicles = pc.fill_null(vehicles, pa.scalar('' if pa.types.is_string(vehicles.type) else -1, vehicles.type))
+    vehicles = vehicles.to_numpy(zero_copy_only=False)
+    seconds = pc.take(timestamps, order).to_numpy(zero_copy_only=False) / 1e6
+    latitude = np.radians(pc.take(table[latitude_field], order).to_numpy(zero_copy_only=False))
+    longitude = np.radians(pc.take(table[longitude_field], order).to_numpy(zero_copy_only=False))
+
+    same_vehicle = vehicles[1:] == vehicles[:-1]
+    dlat = latitude[1:] - latitude[:-1]
+    dlon = longitude[1:] - longitude[:-1]
+    a = np.sin(dlat / 2) ** 2 + np.cos(latitude[:-1]) * np.cos(latitude[1:]) * np.sin(dlon / 2) ** 2
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    hours = (seconds[1:] - seconds[:-1]) / 3600
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(hours > 0, distance_km / hours, np.where(distance_km > 0, np.inf, 0))
+
+    sorted_flags = np.zeros(len(vehicles), dtype=bool)
+    sorted_flags[1:] = same_vehicle & (speed > max_speed_kmh)
+    flags = np.empty_like(sorted_flags)
+    flags[order.to_numpy()] = sorted_flags
+    return flags
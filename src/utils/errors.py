@@ -47,3 +47,23 @@ class UnknownParameterError(ApplicationError):
         self.message = message
         logger.error(self.message, exc_info=True)
         super().__init__(self.message)
+
+class PartialLoadError(ApplicationError):
+    """Exceção para cargas de um intervalo interrompidas por uma falha. `window_start` é o
+    início do trecho que não foi carregado; o intervalo está carregado até ele.
+    """
+    def __init__(self, message='Carga do intervalo interrompida', received=0, loaded=0, window_start=None):
+        self.message = message
+        self.received = received
+        self.loaded = loaded
+        self.window_start = window_start
+        logger.error(self.message)
+        super().__init__(self.message)
+
+class SpooledLoadError(PartialLoadError):
+    """Exceção para cargas que falharam após a extração, com os lotes guardados no spool
+    para serem recarregados na próxima execução. `window_start` é o início da janela do
+    lote guardado.
+    """
+    def __init__(self, message='Carga falhou; lotes mantidos no spool', **kwargs):
+        super().__init__(message, **kwargs)
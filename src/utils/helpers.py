@@ -1,4 +1,8 @@
-import pandas as pd
+import json as jsonlib
+import pyarrow as pa
+import pyarrow.compute as pc
+from utils.errors import ConversionError
+from utils.schemas import table_schema_mapping
 
 
 def json_to_df(json):
@@ -10,4 +14,135 @@ def json_to_df(json):
     Returns:
         Dataframe: Pandas Dataframe com os dados do JSON
     """
+    import pandas as pd
+
     return pd.json_normalize(json)
+
+
+def records_to_arrow(records, endpoint, source_timezone='UTC'):
+    """Converte registros da API em uma tabela Arrow com os tipos declarados para o endpoint.
+
+    Args:
+        records (list): Lista de registros (dicionários) retornados pela API.
+        endpoint (str): Nome do endpoint, chave de `table_schema_mapping`.
+        source_timezone (str): Fuso horário assumido para timestamps sem offset.
+
+    Returns:
+        pyarrow.Table: Tabela com as colunas declaradas seguidas das não declaradas (como texto).
+    """
+    schema = table_schema_mapping.get(endpoint, pa.schema([]))
+    fields = list(schema)
+    extras = sorted(set().union(*records) - set(schema.names))
+    try:
+        arrays = [
+            _cast(raw, field.type, source_timezone)
+            for raw, field in zip(_raw_columns(records, fields), fields)
+        ]
+        for name in extras:
+            fields.append(pa.field(name, pa.string()))
+            arrays.append(pa.array([_as_text(record.get(name)) for record in records], pa.string()))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as exc:
+        raise ConversionError(f'Erro na conversão dos registros do endpoint {endpoint}: {exc}') from exc
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _raw_type(arrow_type):
+    """Tipo em que o valor chega no JSON, antes da conversão para o tipo declarado."""
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_dictionary(arrow_type):
+        return pa.string()
+    return arrow_type
+
+
+def _raw_columns(records, fields):
+    """Extrai as colunas declaradas dos registros.
+
+    O caminho rápido converte a lista inteira em C++ via StructArray; se algum valor
+    não tiver o tipo esperado (ex.: número enviado como texto), cada coluna é extraída
+    individualmente e normalizada.
+    """
+    struct_type = pa.struct([pa.field(field.name, _raw_type(field.type)) for field in fields])
+    try:
+        return pa.array(records, type=struct_type).flatten()
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return [_raw_column([record.get(field.name) for record in records], field.type) for field in fields]
+
+
+def _raw_column(values, arrow_type):
+    if pa.types.is_timestamp(arrow_type):
+        try:
+            return pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.array([_as_text(value) for value in values], pa.string())
+    if pa.types.is_dictionary(arrow_type) or pa.types.is_string(arrow_type):
+        return pa.array([_as_text(value) for value in values], pa.string())
+    try:
+        return pa.array(values, arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Valores numéricos enviados como texto (ex.: "-22.91")
+        return pa.array([_as_text(value) for value in values], pa.string())
+
+
+def _as_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return jsonlib.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _cast(array, arrow_type, source_timezone):
+    if pa.types.is_timestamp(arrow_type):
+        return _to_timestamp(array, arrow_type, source_timezone)
+    if pa.types.is_dictionary(arrow_type):
+        return _safe_cast(array, arrow_type.value_type).dictionary_encode().cast(arrow_type)
+    return _safe_cast(array, arrow_type)
+
+
+def _safe_cast(array, arrow_type):
+    """Converte a coluna inteira; se algum valor não puder ser convertido (ex.: "-22,9"),
+    converte valor a valor e deixa nulos os inválidos, para a etapa de limpeza rejeitá-los."""
+    try:
+        return array.cast(arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array([_scalar_or_none(value, arrow_type) for value in array], arrow_type)
+
+
+def _scalar_or_none(scalar, arrow_type):
+    try:
+        return scalar.cast(arrow_type).as_py()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+
+def _to_timestamp(array, arrow_type, source_timezone):
+    if pa.types.is_null(array.type):
+        return pa.nulls(len(array), arrow_type)
+    if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+        # Timestamps numéricos são tratados como epoch em milissegundos
+        micros = pc.multiply(array.cast(pa.int64(), safe=False), 1000)
+        return micros.cast(pa.timestamp('us')).cast(arrow_type)
+    if pa.types.is_timestamp(array.type) and array.type.tz is not None:
+        return array.cast(arrow_type)
+    try:
+        # Caso usual: timestamps sem offset, interpretados no fuso horário de origem
+        naive = array.cast(pa.timestamp('us'))
+    except pa.ArrowInvalid:
+        try:
+            return array.cast(arrow_type)
+        except pa.ArrowInvalid:
+            # Valores vazios, inválidos (ex.: '0000-00-00 00:00:00') ou com e sem offset
+            # misturados: cada valor é convertido separadamente e os inválidos viram nulos
+            naive = _safe_cast(array, pa.timestamp('us'))
+            aware = _safe_cast(array, pa.timestamp('us', tz='UTC'))
+            if arrow_type.tz is None:
+                return pc.coalesce(naive, aware.cast(pa.timestamp('us')))
+            return pc.coalesce(_assume_timezone(naive, source_timezone).cast(arrow_type), aware.cast(arrow_type))
+    if arrow_type.tz is None:
+        return naive
+    return _assume_timezone(naive, source_timezone).cast(arrow_type)
+
+
+def _assume_timezone(naive, source_timezone):
+    # Horários ambíguos ou inexistentes na troca de horário de verão não invalidam o lote
+    return pc.assume_timezone(naive, source_timezone, ambiguous='earliest', nonexistent='earliest')
@@ -0,0 +1,96 @@
+import codecs
+import json
+from itertools import islice
+
+_WHITESPACE = ' \t\n\r'
+# Caracteres que podem seguir um elemento do array
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+def decode_chunks(chunks, encoding='utf-8'):
+    """Decodifica incrementalmente blocos de bytes em texto.
+
+    Args:
+        chunks (Iterable[bytes]): Blocos de bytes da resposta HTTP.
+        encoding (str): Codificação do conteúdo.
+
+    Yields:
+        str: Blocos de texto decodificados.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _skip(buffer, pos, chars):
+    while pos < len(buffer) and buffer[pos] in chars:
+        pos += 1
+    return pos
+
+
+def iter_json_array(chunks):
+    """Decodifica um array JSON de forma incremental, sem manter o corpo inteiro em memória.
+
+    Args:
+        chunks (Iterable[str]): Blocos de texto contendo um único array JSON.
+
+    Yields:
+        object: Cada elemento do array, na ordem em que aparece.
+
+    Raises:
+        ValueError: Se o conteúdo não for um array JSON válido.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    finished = False
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            pos = _skip(buffer, pos, _WHITESPACE)
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('O conteúdo da resposta não é um array JSON.')
+                started = True
+                pos += 1
+                continue
+            if finished:
+                raise ValueError('Conteúdo inesperado após o fim do array JSON.')
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                finished = True
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # Elemento incompleto, aguarda o próximo bloco
+            if not isinstance(item, (dict, list)) and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+                # Escalar só termina com um delimitador; sem ele pode estar truncado (ex.: '835.' + '5')
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+
+    if not started or not finished or buffer.strip():
+        raise ValueError('Array JSON incompleto ou malformado na resposta.')
+
+
+def iter_batches(items, batch_size):
+    """Agrupa um iterável em listas de no máximo `batch_size` elementos."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,173 @@
+"""Instrumentação leve por etapa de uma invocação.
+
+`start_run` abre as métricas da invocação; durante a execução, `span` mede a duração
+de uma etapa e `record`/`record_job` somam contadores (bytes, linhas, retentativas,
+jobs do BigQuery). As medições são atribuídas ao endpoint informado ou ao endpoint
+corrente da thread (`endpoint_scope`). Sem uma invocação aberta (ex.: backfill,
+benchmarks), as chamadas não registram nada.
+
+Uma instância atende uma invocação por vez, então a invocação corrente é global do
+módulo e compartilhada pelas threads de trabalho.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Chave das medições que não pertencem a um endpoint (ex.: leitura da tabela de controle)
+RUN_SCOPE = '*'
+# Limite de jobs listados individualmente no resumo; os totais consideram todos
+MAX_LISTED_JOBS = 200
+
+_current = None
+_local = threading.local()
+
+
+class RunMetrics:
+    """Métricas de uma invocação: duração e contadores por endpoint e etapa, e jobs do BigQuery."""
+
+    def __init__(self, name):
+        """Construtor da classe RunMetrics
+
+        Args:
+            - name (str): Nome da função executada (ex.: 'main').
+        """
+        self.name = name
+        self.run_id = uuid.uuid4().hex
+        self.started_at = datetime.now(timezone.utc)
+        self.status = None
+        self.duration_seconds = None
+        self.endpoint_status = {}
+        self._started = time.perf_counter()
+        self._stages = defaultdict(lambda: defaultdict(float))
+        self._jobs = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, endpoint=None, seconds=None, **counters):
+        key = (endpoint or current_endpoint(), stage)
+        with self._lock:
+            stats = self._stages[key]
+            if seconds is not None:
+                stats['seconds'] += seconds
+                stats['count'] += 1
+            for name, value in counters.items():
+                stats[name] += value or 0
+
+    def record_job(self, kind, job_id, endpoint=None, **stats):
+        endpoint = endpoint or current_endpoint()
+        with self._lock:
+            self._jobs.append({'kind': kind, 'job_id': job_id, 'endpoint': endpoint, **stats})
+
+    def finish(self, status):
+        self.status = status
+        self.duration_seconds = time.perf_counter() - self._started
+
+    def summary(self):
+        """Resumo da invocação, serializável em JSON."""
+        duration = self.duration_seconds
+        if duration is None:
+            duration = time.perf_counter() - self._started
+        with self._lock:
+            stages = {key: dict(stats) for key, stats in self._stages.items()}
+            jobs = list(self._jobs)
+
+        endpoints = defaultdict(lambda: {'stages': {}})
+        for (endpoint, stage), stats in sorted(stages.items()):
+            endpoints[endpoint]['stages'][stage] = {
+                name: round(value, 4) if name == 'seconds' else int(value) for name, value in stats.items()
+            }
+        totals = defaultdict(float)
+        for stats in stages.values():
+            for name in ('bytes_downloaded', 'rows_received', 'rows_loaded', 'retries'):
+                totals[name] += stats.get(name, 0)
+        for endpoint, data in endpoints.items():
+            loaded = sum(stats.get('rows_loaded', 0) for stats in data['stages'].values())
+            elapsed = data['stages'].get('total', {}).get('seconds')
+            data['rows_loaded'] = int(loaded)
+            data['rows_per_second'] = round(loaded / elapsed, 1) if elapsed else None
+            if endpoint in self.endpoint_status:
+                data['status'] = self.endpoint_status[endpoint]
+
+        return {
+            'run_id': self.run_id,
+            'function': self.name,
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': round(duration, 4),
+            'status': self.status,
+            'rows_received': int(totals['rows_received']),
+            'rows_loaded': int(totals['rows_loaded']),
+            'bytes_downloaded': int(totals['bytes_downloaded']),
+            'retries': int(totals['retries']),
+            'bigquery_jobs': len(jobs),
+            'bytes_processed': sum(job.get('bytes_processed') or 0 for job in jobs),
+            'endpoints': dict(endpoints),
+            'jobs': jobs[:MAX_LISTED_JOBS],
+        }
+
+
+def start_run(name):
+    """Abre as métricas de uma nova invocação e as torna a invocação corrente."""
+    global _current
+    _current = RunMetrics(name)
+    return _current
+
+
+def current_run():
+    return _current
+
+
+def current_endpoint():
+    return getattr(_local, 'endpoint', None) or RUN_SCOPE
+
+
+@contextmanager
+def endpoint_scope(endpoint):
+    """Atribui ao endpoint as medições feitas pela thread dentro do bloco."""
+    previous = getattr(_local, 'endpoint', None)
+    _local.endpoint = endpoint
+    try:
+        yield
+    finally:
+        _local.endpoint = previous
+
+
+@contextmanager
+def span(stage, endpoint=None, **counters):
+    """Mede a duração de uma etapa; os contadores informados só são somados se ela concluir."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        record(stage, endpoint=endpoint, seconds=time.perf_counter() - started, errors=1)
+        raise
+    record(stage, endpoint=endpoint, seconds=time.perf_counter() - started, **counters)
+
+
+def record(stage, endpoint=None, seconds=None, **counters):
+    if _current is not None:
+        _current.record(stage, endpoint=endpoint, seconds=seconds, **counters)
+
+
+def record_job(kind, job_id, endpoint=None, **stats):
+    if _current is not None:
+        _current.record_job(kind, job_id, endpoint=endpoint, **stats)
+
+
+def set_status(endpoint, status):
+    """Registra o status final de um endpoint na invocação."""
+    if _current is not None:
+        _current.endpoint_status[endpoint] = status
+
+
+def run_history_row(summary, schema):
+    """Linha da tabela de histórico de execuções a partir do resumo da invocação.
+
+    As colunas do schema são preenchidas com os campos de mesmo nome do resumo, e a
+    coluna `metrics` recebe o resumo completo em JSON.
+    """
+    row = {field.name: summary.get(field.name) for field in schema if field.name != 'metrics'}
+    row['metrics'] = json.dumps(summary, default=str)
+    return row
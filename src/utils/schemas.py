@@ -0,0 +1,96 @@
+import pyarrow as pa
+
+# Tipos compactos e fixos usados na conversão dos registros da API
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Define o schema declarado de cada endpoint (mesmos nomes de endpoint do registro em api.registry).
+# Campos ausentes no payload viram colunas nulas; campos não declarados são
+# mantidos como texto.
+table_schema_mapping = {
+    'EnvioIplan': pa.schema([
+        pa.field('ordem', CATEGORY),
+        pa.field('latitude', pa.float64()),
+        pa.field('longitude', pa.float64()),
+        pa.field('datahora', TIMESTAMP),
+        pa.field('velocidade', pa.float32()),
+        pa.field('linha', CATEGORY),
+        pa.field('sentido', CATEGORY),
+        pa.field('datahoraenvio', TIMESTAMP),
+        pa.field('datahoraservidor', TIMESTAMP),
+    ]),
+    'EnvioViagensRetroativas': pa.schema([
+        pa.field('id_veiculo', CATEGORY),
+        pa.field('servico', CATEGORY),
+        pa.field('datetime_operacao', TIMESTAMP),
+        pa.field('datetime_entrada', TIMESTAMP),
+        pa.field('datetime_saida', TIMESTAMP),
+        pa.field('datetime_processamento', TIMESTAMP),
+    ]),
+    'EnvioViagensConsolidadas': pa.schema([
+        pa.field('id_viagem', pa.string()),
+        pa.field('id_veiculo', CATEGORY),
+        pa.field('servico', CATEGORY),
+        pa.field('sentido', CATEGORY),
+        pa.field('trajeto', CATEGORY),
+        pa.field('datetime_partida', TIMESTAMP),
+        pa.field('datetime_chegada', TIMESTAMP),
+        pa.field('distancia_planejada', pa.float32()),
+        pa.field('datetime_processamento', TIMESTAMP),
+    ]),
+}
+
+# Coluna de auditoria adicionada pela aplicação a todas as tabelas de destino
+EXTRACTION_TS_FIELD = pa.field('ro_extraction_ts', TIMESTAMP)
+
+# Particionamento diário pelo timestamp do evento e clusterização por veículo/linha
+table_partitioning = {
+    'EnvioIplan': {'partition_field': 'datahora', 'clustering_fields': ['ordem', 'linha']},
+    'EnvioViagensRetroativas': {'partition_field': 'datetime_operacao',
+                                'clustering_fields': ['id_veiculo', 'servico']},
+    'EnvioViagensConsolidadas': {'partition_field': 'datetime_partida',
+                                 'clustering_fields': ['id_veiculo', 'servico']},
+}
+
+# Chave natural de cada endpoint, usada para deduplicar cargas repetidas
+table_natural_keys = {
+    'EnvioIplan': ['ordem', 'datahora', 'latitude', 'longitude'],
+    'EnvioViagensRetroativas': ['id_veiculo', 'datetime_operacao', 'servico'],
+    'EnvioViagensConsolidadas': ['id_viagem'],
+}
+
+# Colunas usadas pelas regras de validação de cada endpoint (utils.cleaning)
+table_quality_rules = {
+    'EnvioIplan': {'timestamp_field': 'datahora', 'latitude_field': 'latitude',
+                   'longitude_field': 'longitude', 'vehicle_field': 'ordem'},
+    'EnvioViagensRetroativas': {'timestamp_field': 'datetime_operacao'},
+    'EnvioViagensConsolidadas': {'timestamp_field': 'datetime_partida'},
+}
+
+# Sinalização de saltos de GPS adicionada pela etapa de limpeza
+JUMP_FLAG_FIELD = pa.field('ro_salto_gps', pa.bool_())
+
+# Histórico de execuções (uma linha por invocação), particionado pelo início da execução;
+# `metrics` guarda o resumo completo da invocação em JSON
+RUN_HISTORY_SCHEMA = pa.schema([
+    pa.field('run_id', pa.string()),
+    pa.field('function', pa.string()),
+    pa.field('started_at', TIMESTAMP),
+    pa.field('duration_seconds', pa.float64()),
+    pa.field('status', pa.string()),
+    pa.field('rows_received', pa.int64()),
+    pa.field('rows_loaded', pa.int64()),
+    pa.field('bytes_downloaded', pa.int64()),
+    pa.field('retries', pa.int64()),
+    pa.field('bigquery_jobs', pa.int64()),
+    pa.field('bytes_processed', pa.int64()),
+    pa.field('metrics', pa.string()),
+])
+
+
+def destination_schema(endpoint):
+    """Schema completo da tabela de destino: campos declarados e colunas de auditoria."""
+    schema = table_schema_mapping.get(endpoint, pa.schema([]))
+    if 'vehicle_field' in table_quality_rules.get(endpoint, {}):
+        schema = schema.append(JUMP_FLAG_FIELD)
+    return schema.append(EXTRACTION_TS_FIELD)
@@ -1,6 +0,0 @@
-# Define o mapeamento de nomes de tabela
-table_name_mapping = {
-    'EnvioIplan': 'sppo_gps_zirix',
-    'EnvioViagensRetroativas': 'sppo_realocacao_zirix',
-    'EnvioViagensConsolidadas': 'sppo_viagens_zirix'
-}
\ No newline at end of file
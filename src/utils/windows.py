@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_date(value):
+    """Converte uma data no formato usado pela API (ou ISO 8601) em datetime."""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def format_date(value):
+    """Formata um datetime no padrão de data esperado pela API."""
+    return value.strftime(DATE_FORMAT)
+
+
+def plan_windows(start, end, step):
+    """Divide o intervalo [start, end) em sub-janelas consecutivas de no máximo `step`.
+
+    Args:
+        start (datetime): Início do intervalo.
+        end (datetime): Fim do intervalo.
+        step (timedelta): Tamanho máximo de cada sub-janela.
+
+    Returns:
+        list: Lista de tuplas (início, fim) cobrindo todo o intervalo, em ordem.
+    """
+    if step <= timedelta(0):
+        raise ValueError('O tamanho da sub-janela deve ser positivo.')
+    windows = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + step, end)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
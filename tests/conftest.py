@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+# Os módulos da aplicação são importados a partir de src/, como no deploy; os substitutos
+# locais do BigQuery e da Zirix, a partir de benchmarks/
+ROOT_DIR = Path(__file__).resolve().parent.parent
+for path in (ROOT_DIR / 'src', ROOT_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# Configuração mínima para importar `config` sem um .env
+import benchmarks.synthetic  # noqa: E402,F401
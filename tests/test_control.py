@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from benchmarks.fake_bigquery import InMemoryGoogleCloudClient
+from cloud.control import ControlState
+
+DATASET, CONTROL_TABLE = 'dataset', 'control'
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+NOW = START + timedelta(minutes=60)
+ENDPOINTS = {'EnvioIplan': 'zirix', 'EnvioViagensConsolidadas': 'zirix'}
+
+
+@pytest.fixture
+def client():
+    client = InMemoryGoogleCloudClient()
+    client.set_control_row('zirix', 'EnvioIplan', START)
+    return client
+
+
+def load(client):
+    return ControlState(client, DATASET, CONTROL_TABLE, ENDPOINTS).load(NOW)
+
+
+def test_load_seeds_missing_endpoints_at_now(client):
+    control = load(client)
+    assert control.watermark('EnvioIplan') == START
+    assert control.watermark('EnvioViagensConsolidadas') == NOW
+    assert client.control[('zirix', 'EnvioViagensConsolidadas')]['last_extraction'] == NOW
+
+
+def test_staged_changes_are_visible_before_commit(client):
+    control = load(client)
+    control.stage('EnvioIplan', 'success', last_extraction=START + timedelta(minutes=10))
+    assert control.watermark('EnvioIplan') == START + timedelta(minutes=10)
+    assert client.control[('zirix', 'EnvioIplan')]['last_extraction'] == START
+
+    control.commit()
+    assert client.control[('zirix', 'EnvioIplan')] == {
+        'api': 'zirix', 'endpoint': 'EnvioIplan',
+        'last_extraction': START + timedelta(minutes=10), 'status': 'success',
+    }
+
+
+def test_stage_without_watermark_keeps_the_current_one(client):
+    control = load(client)
+    control.stage('EnvioIplan', 'success', last_extraction=START + timedelta(minutes=10))
+    control.stage('EnvioIplan', 'failed')
+    control.commit()
+    assert client.control[('zirix', 'EnvioIplan')]['last_extraction'] == START + timedelta(minutes=10)
+    assert client.control[('zirix', 'EnvioIplan')]['status'] == 'failed'
+
+
+def test_commit_writes_all_staged_endpoints_with_one_merge(client, monkeypatch):
+    control = load(client)
+    merges = []
+    merge = client.merge_control_rows
+    monkeypatch.setattr(client, 'merge_control_rows', lambda *args: merges.append(args[2]) or merge(*args))
+    control.stage('EnvioIplan', 'success', last_extraction=START + timedelta(minutes=10))
+    control.stage('EnvioViagensConsolidadas', 'failed')
+    control.commit()
+    control.commit()
+    assert [sorted(row['endpoint'] for row in rows) for rows in merges] == [['EnvioIplan', 'EnvioViagensConsolidadas']]
+
+
+def test_failed_commit_keeps_staged_changes_for_retry(client, monkeypatch):
+    control = load(client)
+    merge = client.merge_control_rows
+
+    def failing_merge(*args):
+        raise RuntimeError('falha simulada no MERGE')
+
+    monkeypatch.setattr(client, 'merge_control_rows', failing_merge)
+    control.stage('EnvioIplan', 'success', last_extraction=START + timedelta(minutes=10))
+    with pytest.raises(RuntimeError):
+        control.commit()
+    assert control.watermark('EnvioIplan') == START + timedelta(minutes=10)
+    assert client.control[('zirix', 'EnvioIplan')]['last_extraction'] == START
+
+    # Mudanças registradas depois da falha prevalecem sobre as que ficaram pendentes
+    control.stage('EnvioIplan', 'success', last_extraction=START + timedelta(minutes=20))
+    control.stage('EnvioViagensConsolidadas', 'failed')
+    monkeypatch.setattr(client, 'merge_control_rows', merge)
+    control.commit()
+    assert client.control[('zirix', 'EnvioIplan')]['last_extraction'] == START + timedelta(minutes=20)
+    assert client.control[('zirix', 'EnvioViagensConsolidadas')]['status'] == 'failed'
+    assert control.rows['EnvioIplan']['last_extraction'] == START + timedelta(minutes=20)
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+import pyarrow as pa
+
+from utils.helpers import records_to_arrow
+
+
+def record(**values):
+    base = {'ordem': 'A1', 'latitude': -22.9, 'longitude': -43.2, 'datahora': '2024-05-01 10:00:00',
+            'velocidade': 10}
+    return {**base, **values}
+
+
+def test_typed_conversion_assumes_source_timezone():
+    table = records_to_arrow([record()], 'EnvioIplan', source_timezone='America/Sao_Paulo')
+    assert table['datahora'].to_pylist() == [datetime(2024, 5, 1, 13, tzinfo=timezone.utc)]
+    assert table.schema.field('velocidade').type == pa.float32()
+
+
+def test_unparseable_values_become_null_instead_of_failing_the_batch():
+    records = [
+        record(),
+        record(datahora=''),
+        record(datahora='0000-00-00 00:00:00'),
+        record(latitude='-22,9', velocidade='rápido'),
+        record(datahora='2024-05-01T10:00:00-03:00'),
+    ]
+    table = records_to_arrow(records, 'EnvioIplan', source_timezone='America/Sao_Paulo')
+    assert table.num_rows == 5
+    expected = datetime(2024, 5, 1, 13, tzinfo=timezone.utc)
+    assert table['datahora'].to_pylist() == [expected, None, None, expected, expected]
+    assert table['latitude'].to_pylist() == [-22.9, -22.9, -22.9, None, -22.9]
+    assert table['velocidade'].to_pylist()[3] is None
+
+
+def test_numbers_sent_as_text_are_converted():
+    table = records_to_arrow([record(latitude='-22.91', longitude='-43.2')], 'EnvioIplan')
+    assert table['latitude'].to_pylist() == [-22.91]
+
+
+def test_undeclared_fields_are_kept_as_text():
+    table = records_to_arrow([record(extra={'a': 1})], 'EnvioIplan')
+    assert table['extra'].to_pylist() == ['{"a": 1}']
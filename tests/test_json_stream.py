@@ -0,0 +1,80 @@
+import json
+import random
+
+import pytest
+
+from utils.json_stream import decode_chunks, iter_json_array, iter_batches
+
+SAMPLES = [
+    '[]',
+    '[ ]',
+    '[835.5]',
+    '[1e5, -2.5E-3, 0, 12345678901234567890]',
+    '[true, false, null, "texto", "com \\"aspas\\" e , ]"]',
+    '[{"ordem": "A123", "latitude": -22.91, "datahora": "2024-05-01 00:00:00"}, [1, [2, 3]], {}]',
+    ' \n[ 1 ,\t{"a": [1, 2]} , "ç ã", 3.25 ]\n ',
+]
+
+
+def split_at(text, positions):
+    bounds = [0, *sorted(positions), len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_every_single_split_matches_json_loads(text):
+    expected = json.loads(text)
+    for position in range(len(text) + 1):
+        assert list(iter_json_array(split_at(text, [position]))) == expected
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_random_splits_match_json_loads(text):
+    rnd = random.Random(text)
+    expected = json.loads(text)
+    for _ in range(200):
+        positions = rnd.sample(range(len(text) + 1), rnd.randint(0, min(8, len(text))))
+        assert list(iter_json_array(split_at(text, positions))) == expected
+
+
+def test_scalar_whose_prefix_is_valid_json():
+    assert list(iter_json_array(['[835.', '5]'])) == [835.5]
+    assert list(iter_json_array(['[1e', '5]'])) == [1e5]
+    assert list(iter_json_array(['[tr', 'ue, nu', 'll]'])) == [True, None]
+
+
+def test_empty_array():
+    assert list(iter_json_array(['[]'])) == []
+    assert list(iter_json_array(['[', ']'])) == []
+
+
+@pytest.mark.parametrize('chunks', [
+    [],
+    [''],
+    ['[1, 2'],
+    ['[1, 2,'],
+    ['[835.'],
+    ['[{"a": 1}'],
+    ['[{"a": 1'],
+    ['["texto'],
+])
+def test_truncated_input_raises(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks))
+
+
+@pytest.mark.parametrize('chunks', [['{"a": 1}'], ['[1] 2'], ['[1x]'], ['[1, 2]', ']']])
+def test_malformed_input_raises(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks))
+
+
+def test_decode_chunks_with_split_multibyte_character():
+    data = '["São Cristóvão"]'.encode()
+    chunks = [data[i:i + 1] for i in range(len(data))]
+    assert list(iter_json_array(decode_chunks(chunks))) == ['São Cristóvão']
+
+
+def test_iter_batches():
+    assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_batches([], 2)) == []
@@ -0,0 +1,24 @@
+import io
+import json
+from datetime import date
+
+from logger import log_metrics, metrics_logger
+
+
+def test_metrics_are_emitted_as_bare_json_lines():
+    # O pytest também instala seus handlers de captura no logger; o do módulo é o primeiro
+    handler = metrics_logger.handlers[0]
+    stream = io.StringIO()
+    previous = handler.setStream(stream)
+    try:
+        log_metrics('partition_count', endpoint='EnvioIplan', day=date(2024, 5, 1), total_records=120)
+    finally:
+        handler.setStream(previous)
+
+    # A linha inteira é o JSON, sem o prefixo de texto do basicConfig
+    [line] = stream.getvalue().splitlines()
+    assert json.loads(line) == {
+        'severity': 'INFO', 'event': 'partition_count', 'endpoint': 'EnvioIplan',
+        'day': '2024-05-01', 'total_records': 120,
+    }
+    assert not metrics_logger.propagate
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main
+from benchmarks.fake_bigquery import InMemoryGoogleCloudClient
+from benchmarks.synthetic import registros
+from cloud.control import ControlState
+from cloud.spool import Spool
+from utils.helpers import records_to_arrow
+from utils.windows import parse_date
+
+ENDPOINT = 'EnvioIplan'
+DATASET, CONTROL_TABLE = 'dataset', 'control'
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+NOW = START + timedelta(minutes=60)
+ROWS_PER_WINDOW = 20
+
+
+class Pipeline:
+    """Executa o pipeline de um endpoint contra o BigQuery em memória, com a API substituída."""
+
+    def __init__(self, monkeypatch):
+        self.client = InMemoryGoogleCloudClient()
+        self.client.set_control_row('zirix', ENDPOINT, START)
+        self.fetched = []
+        self.failing_loads = set()
+        self.spool = None
+        self._loads = 0
+        monkeypatch.setattr(main, 'fetch_batches', self._fetch_batches)
+        monkeypatch.setattr(main, 'get_provider', lambda name: None)
+        monkeypatch.setattr(main, 'get_spool', lambda: self.spool)
+        monkeypatch.setattr(main, 'LOAD_BATCH_ROWS', 1)
+        monkeypatch.setitem(main.SUBWINDOW_MINUTES, ENDPOINT, 10)
+        load = self.client.load_arrow_to_bigquery
+
+        def failing_load(*args, **kwargs):
+            self._loads += 1
+            if self._loads in self.failing_loads:
+                raise RuntimeError('falha simulada na carga')
+            return load(*args, **kwargs)
+
+        monkeypatch.setattr(self.client, 'load_arrow_to_bigquery', failing_load)
+
+    def _fetch_batches(self, gps_provider, endpoint, start_date, end_date):
+        start = parse_date(start_date).replace(tzinfo=timezone.utc)
+        self.fetched.append(start)
+        return iter([registros(ROWS_PER_WINDOW, start=start, seed=int(start.timestamp()),
+                               vehicles=ROWS_PER_WINDOW)])
+
+    def run(self, now=NOW):
+        control = ControlState(self.client, DATASET, CONTROL_TABLE, {ENDPOINT: 'zirix'}).load(now)
+        status = main._run_endpoint('zirix', self.client, control, ENDPOINT, now)
+        control.commit()
+        return status
+
+    def watermark(self):
+        return self.client.control[('zirix', ENDPOINT)]['last_extraction']
+
+    def rows(self):
+        return sum(table.num_rows for table in self.client.tables.get((main.GOOGLE_CLOUD_DATASET,
+                                                                       main.destination_table(ENDPOINT)), []))
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    return Pipeline(monkeypatch)
+
+
+@pytest.fixture
+def spooled_pipeline(pipeline, tmp_path):
+    pipeline.spool = Spool(str(tmp_path), max_bytes=2 ** 30)
+    return pipeline
+
+
+def test_window_is_loaded_once(pipeline):
+    assert pipeline.run() == 'success'
+    assert pipeline.watermark() == NOW
+    assert pipeline.rows() == 6 * ROWS_PER_WINDOW
+
+
+def test_failed_load_advances_watermark_only_past_loaded_groups(pipeline):
+    pipeline.failing_loads = {2}
+    assert pipeline.run() == 'failed'
+    assert pipeline.watermark() == START + timedelta(minutes=10)
+    assert pipeline.rows() == ROWS_PER_WINDOW
+
+    pipeline.fetched.clear()
+    assert pipeline.run() == 'success'
+    assert pipeline.fetched[0] == START + timedelta(minutes=10)
+    assert pipeline.watermark() == NOW
+    # Nenhum grupo já carregado é carregado de novo
+    assert pipeline.rows() == 6 * ROWS_PER_WINDOW
+
+
+def test_failed_load_is_spooled_and_watermark_stays_at_its_start(spooled_pipeline):
+    spooled_pipeline.failing_loads = {2}
+    assert spooled_pipeline.run() == 'spooled'
+    assert spooled_pipeline.watermark() == START + timedelta(minutes=10)
+    assert spooled_pipeline.rows() == ROWS_PER_WINDOW
+    [entry] = spooled_pipeline.spool.pending(ENDPOINT)
+    assert datetime.fromisoformat(entry['start']).replace(tzinfo=timezone.utc) == START + timedelta(minutes=10)
+    assert entry['rows'] == ROWS_PER_WINDOW
+
+
+def test_spooled_window_is_replayed_without_fetching_again(spooled_pipeline):
+    spooled_pipeline.failing_loads = {2}
+    spooled_pipeline.run()
+
+    spooled_pipeline.fetched.clear()
+    assert spooled_pipeline.run() == 'success'
+    # A sub-janela guardada vem do spool; a extração recomeça logo depois dela
+    assert spooled_pipeline.fetched[0] == START + timedelta(minutes=20)
+    assert spooled_pipeline.watermark() == NOW
+    assert spooled_pipeline.rows() == 6 * ROWS_PER_WINDOW
+    assert spooled_pipeline.spool.pending(ENDPOINT) == []
+
+
+def _corrupt(spool, entry):
+    spool.backend.write(f"{entry['key']}.arrow", b'lote corrompido')
+
+
+def _evict(spool, entry):
+    # Um lote de outro endpoint ultrapassa o limite do spool e descarta o mais antigo
+    spool.max_bytes = 1
+    table = records_to_arrow(registros(ROWS_PER_WINDOW, start=NOW, seed=1), ENDPOINT)
+    spool.put('OutroEndpoint', NOW, NOW + timedelta(minutes=10), table, NOW)
+
+
+@pytest.mark.parametrize('lose_entry', [_corrupt, _evict], ids=['corrupted', 'evicted'])
+def test_lost_spool_entry_is_fetched_again(spooled_pipeline, lose_entry):
+    spooled_pipeline.failing_loads = {2}
+    spooled_pipeline.run()
+    [entry] = spooled_pipeline.spool.pending(ENDPOINT)
+    lose_entry(spooled_pipeline.spool, entry)
+
+    spooled_pipeline.fetched.clear()
+    assert spooled_pipeline.run() == 'success'
+    assert spooled_pipeline.fetched[0] == START + timedelta(minutes=10)
+    assert spooled_pipeline.watermark() == NOW
+    assert spooled_pipeline.rows() == 6 * ROWS_PER_WINDOW
+    assert spooled_pipeline.spool.pending(ENDPOINT) == []
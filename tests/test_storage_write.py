@@ -0,0 +1,104 @@
+import pyarrow as pa
+import pytest
+
+from cloud.storage_write import InMemoryArrowWriter, StorageWriteSink
+from utils.errors import GoogleCloudError
+
+
+def make_table(start, rows):
+    return pa.table({
+        'ordem': pa.array([f'A{i % 7}' for i in range(start, start + rows)]).dictionary_encode(),
+        'velocidade': pa.array([float(i) for i in range(start, start + rows)], pa.float32()),
+    })
+
+
+class FailingWriter(InMemoryArrowWriter):
+    """Escritor local que recusa o append de número `fail_on` (a partir de 1)."""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+        self.attempts = 0
+
+    def append(self, batch, offset):
+        self.attempts += 1
+        if self.attempts == self.fail_on:
+            raise GoogleCloudError('append recusado')
+        super().append(batch, offset)
+
+
+def test_appends_full_batches_of_flush_rows_and_flushes_the_rest_on_exit():
+    writer = InMemoryArrowWriter()
+    with StorageWriteSink(writer, flush_rows=100) as sink:
+        sink.write(make_table(0, 250))
+        assert [batch.num_rows for batch in writer.appended] == [100, 100]
+        # Nada fica visível antes da confirmação do stream
+        assert writer.batches == []
+    assert [batch.num_rows for batch in writer.batches] == [100, 100, 50]
+    assert sink.appends == 3
+    assert writer.finalized and writer.committed
+
+
+def test_accumulates_small_tables_until_flush_rows():
+    writer = InMemoryArrowWriter()
+    with StorageWriteSink(writer, flush_rows=100) as sink:
+        for start in range(0, 90, 30):
+            sink.write(make_table(start, 30))
+        assert writer.appended == []
+        sink.write(make_table(90, 30))
+        assert [batch.num_rows for batch in writer.appended] == [100]
+    assert [batch.num_rows for batch in writer.batches] == [100, 20]
+
+
+def test_offsets_follow_rows_written_and_preserve_order():
+    writer = InMemoryArrowWriter()
+    with StorageWriteSink(writer, flush_rows=64) as sink:
+        for start in range(0, 300, 37):
+            sink.write(make_table(start, min(37, 300 - start)))
+    assert sink.offset == writer.rows == 300
+    table = writer.to_table()
+    assert table.column('velocidade').to_pylist() == [float(i) for i in range(300)]
+    # Colunas dictionary são enviadas como texto
+    assert table.schema.field('ordem').type == pa.string()
+
+
+def test_partial_failure_commits_nothing():
+    writer = FailingWriter(fail_on=2)
+    with pytest.raises(GoogleCloudError):
+        with StorageWriteSink(writer, flush_rows=100) as sink:
+            sink.write(make_table(0, 350))
+    assert sink.offset == writer.rows == 100
+    assert sink.appends == 1
+    # O stream é finalizado sem confirmar: o append aceito não fica visível e o lote
+    # pode ser reenviado inteiro sem duplicar linhas
+    assert writer.finalized and not writer.committed
+    assert writer.to_table() is None
+
+
+def test_failure_in_body_does_not_flush_pending_rows():
+    writer = InMemoryArrowWriter()
+    with pytest.raises(RuntimeError):
+        with StorageWriteSink(writer, flush_rows=100) as sink:
+            sink.write(make_table(0, 40))
+            raise RuntimeError('falha na conversão')
+    assert writer.appended == writer.batches == []
+    assert sink.offset == 0
+    assert writer.finalized and not writer.committed
+
+
+def test_in_memory_writer_rejects_unexpected_offset():
+    writer = InMemoryArrowWriter()
+    writer.open()
+    batch = make_table(0, 10).to_batches()[0]
+    writer.append(batch, 0)
+    with pytest.raises(GoogleCloudError):
+        writer.append(batch, 0)
+
+
+def test_in_memory_writer_requires_finalize_before_commit():
+    writer = InMemoryArrowWriter()
+    writer.open()
+    writer.append(make_table(0, 10).to_batches()[0], 0)
+    with pytest.raises(GoogleCloudError):
+        writer.commit()
+    assert writer.batches == []